@@ -0,0 +1,159 @@
+import io
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+from gatorLibrary import BACKENDS, EXPORT_FORMATS, exportBooks
+
+# Book details as printed by printBookDetails, parsed back the way an ETL job reading the text output does
+BOOK_DETAILS = re.compile(
+    r'BookID = (-?\d+)\nTitle = "(.*)"\nAuthor = "(.*)"\nAvailability = "(\w+)"\nBorrowedBy = (-?\w+)\n'
+    r"Reservations = \[(.*)\]\n\n"
+)
+
+
+def buildLibrary(backend, bookIDs):
+    """
+    Create a library with the selected backend and insert the given books.
+
+    Params:
+    - backend (str): name of the tree backend in BACKENDS
+    - bookIDs (list): IDs of the books to insert
+
+    Returns:
+        The library
+    """
+    library = BACKENDS[backend]()
+    for bookID in bookIDs:
+        library.insertBook(bookID, f"Book{bookID}", f"Author{bookID % 100}", "Yes")
+    return library
+
+
+def timeRangeScans(library, ranges, render):
+    """
+    Run PrintBooks over every range and measure the elapsed time.
+
+    Params:
+    - library: library to query
+    - ranges (list): (bookID1, bookID2) pairs
+    - render (bool): print the book details to the null device; if False only the scan is measured
+
+    Returns:
+        Elapsed time in seconds
+    """
+    if not render:
+        # Skip the rendering so that only the traversal is measured
+        library.printBookDetails = lambda node: None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for bookID1, bookID2 in ranges:
+            library.printBooks(bookID1, bookID2)
+        elapsed = time.perf_counter() - start
+    if not render:
+        del library.printBookDetails
+    return elapsed
+
+
+def timeRenderAndParse(library, bookID1, bookID2):
+    """
+    Render the books in a range with PrintBooks and parse the text back into records.
+
+    Params:
+    - library: library to query
+    - bookID1 (int): initial BookID
+    - bookID2 (int): end BookID
+
+    Returns:
+        Elapsed time in seconds
+    """
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        library.printBooks(bookID1, bookID2)
+    records = [
+        (
+            int(bookID), title, author, availability, None if borrowedBy == "None" else int(borrowedBy),
+            [int(patronID) for patronID in reservations.split(", ")] if reservations else [],
+        )
+        for bookID, title, author, availability, borrowedBy, reservations in BOOK_DETAILS.findall(output.getvalue())
+    ]
+    elapsed = time.perf_counter() - start
+    assert len(records) == sum(1 for _ in library.iterBooks(bookID1, bookID2))
+    return elapsed
+
+
+def timeExport(library, exportFormat, bookID1, bookID2):
+    """
+    Export the books in a range to the null device.
+
+    Params:
+    - library: library to export
+    - exportFormat (str): one of EXPORT_FORMATS
+    - bookID1 (int): initial BookID
+    - bookID2 (int): end BookID
+
+    Returns:
+        Elapsed time in seconds
+    """
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        exportBooks(library, devnull, exportFormat, bookID1, bookID2)
+        return time.perf_counter() - start
+
+
+def main(bookCount, widths, queries, seed):
+    """
+    Compare PrintBooks range scans of all the backends across range widths, and the export of the whole catalog
+    with rendering it and parsing the text back, and print the tables.
+
+    Params:
+    - bookCount (int): number of books in the library
+    - widths (list): widths of the scanned ID ranges
+    - queries (int): number of range scans per width
+    - seed (int): seed of the random book IDs and ranges
+
+    Returns:
+        None
+    """
+    rng = random.Random(seed)
+    keySpace = bookCount * 10
+    bookIDs = rng.sample(range(keySpace), bookCount)
+    libraries = {backend: buildLibrary(backend, bookIDs) for backend in BACKENDS}
+
+    print(f"{bookCount} books, {queries} PrintBooks per width, time in ms (scan only / with rendering)")
+    print(f"{'width':>10}" + "".join(f"{backend:>24}" for backend in libraries))
+    for width in widths:
+        starts = [rng.randrange(max(keySpace - width, 1)) for _ in range(queries)]
+        ranges = [(start, start + width) for start in starts]
+        row = f"{width:>10}"
+        for library in libraries.values():
+            scan = timeRangeScans(library, ranges, render=False) * 1000
+            rendered = timeRangeScans(library, ranges, render=True) * 1000
+            row += f"{scan:>13.1f} /{rendered:>9.1f}"
+        print(row)
+
+    print()
+    print("Whole catalog as records, time in ms (PrintBooks rendered and parsed back, Export in each format)")
+    print(f"{'backend':>10}{'parsed text':>14}" + "".join(f"{exportFormat:>10}" for exportFormat in EXPORT_FORMATS))
+    for backend, library in libraries.items():
+        row = f"{backend:>10}{timeRenderAndParse(library, 0, keySpace) * 1000:>14.1f}"
+        for exportFormat in EXPORT_FORMATS:
+            row += f"{timeExport(library, exportFormat, 0, keySpace) * 1000:>10.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PrintBooks range scans and Export of the tree backends")
+    parser.add_argument("--books", type=int, default=100000, help="number of books (default: 100000)")
+    parser.add_argument(
+        "--widths", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+        help="widths of the scanned ID ranges (default: 10 100 1000 10000 100000)",
+    )
+    parser.add_argument("--queries", type=int, default=100, help="range scans per width (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    arguments = parser.parse_args(sys.argv[1:])
+    main(arguments.books, arguments.widths, arguments.queries, arguments.seed)
@@ -1,6 +1,20 @@
+import os
 import sys
 import time
 import re
+import argparse
+import csv
+import json
+import sqlite3
+import asyncio
+import threading
+import array
+import bisect
+import collections
+import heapq
+import contextlib
+import io
+import multiprocessing
 
 class BinaryMinHeap:
 
@@ -30,12 +44,12 @@ class BinaryMinHeap:
             - res (tuple): Reservation information represented as a tuple
 
         Returns:
-            None
+            bool: True if the reservation was added, False if the waitlist is full
         """
         if len(self.heap) >= self.maxSize:
             # If the heap is full, print a message and return
             print("Reservation waitlist is full.")
-            return
+            return False
 
         # Append the reservation to the heap
         self.heap.append(res)
@@ -54,6 +68,7 @@ class BinaryMinHeap:
                 self.heap[i],
             )
             i = self.parent(i)
+        return True
 
     def heapify(self, idx):
         """
@@ -94,6 +109,21 @@ class BinaryMinHeap:
         self.heap.remove(nextReservation)
         return nextReservation
 
+    def removeReservation(self, res):
+        """
+        Removes a specific reservation from the heap.
+
+        Params:
+            - res (tuple): Reservation to remove
+
+        Returns:
+            bool: True if the reservation was in the heap
+        """
+        if res not in self.heap:
+            return False
+        self.heap.remove(res)
+        return True
+
 
 class Node:
 
@@ -114,658 +144,2838 @@ class Node:
         self.availability = availabilityStatus
         self.borrowedBy = borrowedBy
         self.reservationHeap = BinaryMinHeap()
+        self.metadataKey = None  # Key of the title and author in the MetadataStore, if they are kept on disk
         self.color = 1
         self.left = None
         self.right = None
         self.parent = None
 
 
-class RedBlackTree:
+class RenderCache:
 
-    def __init__(self):
-        """Initialize the tree with a null node (TNULL) representing the end of the tree
+    def __init__(self, maxSize, maxRangeBytes=1 << 20):
         """
-        self.TNULL = Node(0, None, None, False)
-        self.TNULL.color = 0  # Set the initial color of the null node to black
-        self.TNULL.left = None
-        self.TNULL.right = None
-        self.root = self.TNULL  # Root of the tree is initially set to the null node
-        self.colorFlips = 0
+        Initialize a bounded LRU cache of rendered book records and PrintBooks range results.
 
-    def searchTreeHelper(self, node, bookID):
+        Params:
+            - maxSize (int): maximum number of book records, and separately of range results, kept
+            - maxRangeBytes (int): maximum memory used by the text of the range results kept
         """
-        Helper for searching the tree for a specific BookID.
+        self.maxSize = maxSize
+        self.maxRangeBytes = maxRangeBytes
+        self.books = collections.OrderedDict()  # bookID -> (owner, text)
+        self.ranges = collections.OrderedDict()  # (bookID1, bookID2) -> text
+        self.rangeBytes = 0
+        # Ranges by width class and start: a range narrower than 2**k is filed in class k under bookID1 >> k, so
+        # the ranges containing an ID are in two buckets of every class, found without scanning all the ranges
+        self.rangeIndex = {}  # k -> {bookID1 >> k: set of range keys}
+        self.hits = 0
+        self.misses = 0
+
+    def lookupBook(self, bookID, owner):
+        """
+        Look up the rendered record of a book.
 
         Params:
-            - node (Node): a node
             - bookID (int): ID of the book
+            - owner: node (or slot) the record must have been rendered from
 
         Returns:
-            Node that has the BookID
+            The rendered text, None on a miss
         """
-        # Base case: If the current node is the null node (TNULL) or the book ID matches
-        if node == self.TNULL or bookID == node.bookID:
-            return node
+        entry = self.books.get(bookID)
+        # Book IDs are not guaranteed unique, so the record must also come from the same node
+        if entry is None or entry[0] != owner:
+            self.misses += 1
+            return None
+        self.books.move_to_end(bookID)
+        self.hits += 1
+        return entry[1]
+
+    def storeBook(self, bookID, owner, text):
+        """
+        Store the rendered record of a book, evicting the least recently used record if the cache is full.
 
-        # If the book ID is less than the current node's ID, search in the left subtree
-        if bookID < node.bookID:
-            return self.searchTreeHelper(node.left, bookID)
+        Params:
+            - bookID (int): ID of the book
+            - owner: node (or slot) the record was rendered from
+            - text (str): rendered record
 
-        # Otherwise, search in the right subtree
-        return self.searchTreeHelper(node.right, bookID)
+        Returns:
+            None
+        """
+        self.books[bookID] = (owner, text)
+        self.books.move_to_end(bookID)
+        if len(self.books) > self.maxSize:
+            self.books.popitem(last=False)
 
-    def deleteFix(self, x):
+    def lookupRange(self, bookID1, bookID2):
         """
-        Balances the tree after deletion of a Node.
+        Look up the rendered result of PrintBooks(bookID1, bookID2).
+
+        Returns:
+            The rendered text, None on a miss
+        """
+        text = self.ranges.get((bookID1, bookID2))
+        if text is None:
+            self.misses += 1
+            return None
+        self.ranges.move_to_end((bookID1, bookID2))
+        self.hits += 1
+        return text
+
+    @staticmethod
+    def rangeBucket(key):
+        """
+        Returns:
+            tuple: (width class, start bucket) of a range key in the range index
+        """
+        widthClass = max(key[1] - key[0], 0).bit_length()
+        return widthClass, key[0] >> widthClass
+
+    def storeRange(self, bookID1, bookID2, text):
+        """
+        Store the rendered result of PrintBooks(bookID1, bookID2), evicting the least recently used results while
+        the cache holds too many results or too much text. A result larger than the whole budget is not stored.
+
+        Returns:
+            None
+        """
+        key = (bookID1, bookID2)
+        self.removeRange(key)
+        size = sys.getsizeof(text)
+        if size > self.maxRangeBytes:
+            return
+        self.ranges[key] = text
+        self.rangeBytes += size
+        widthClass, bucket = self.rangeBucket(key)
+        self.rangeIndex.setdefault(widthClass, {}).setdefault(bucket, set()).add(key)
+        while len(self.ranges) > self.maxSize or self.rangeBytes > self.maxRangeBytes:
+            self.removeRange(next(iter(self.ranges)))
+
+    def removeRange(self, key):
+        """
+        Drop a range result and its entry in the range index.
 
         Params:
-            - node (Node): a node
-            - bookID (int): ID of a book
+            - key (tuple): (bookID1, bookID2)
 
-        Return:
-             None
+        Returns:
+            None
         """
-        while x != self.root and x.color == 0:
-            if x == x.parent.left:
-                s = x.parent.right  # Sibling node
-                if s.color == 1:
-                    # Case 1: Sibling is red, perform a color flip.
-                    if s.color == 1:
-                        self.colorFlips += 1
-                    s.color = 0
-                    if x.parent.color == 0:
-                        self.colorFlips += 1
-                    x.parent.color = 1
-                    self.leftRotate(x.parent)
-                    s = x.parent.right
+        text = self.ranges.pop(key, None)
+        if text is None:
+            return
+        self.rangeBytes -= sys.getsizeof(text)
+        widthClass, bucket = self.rangeBucket(key)
+        buckets = self.rangeIndex[widthClass]
+        buckets[bucket].discard(key)
+        if not buckets[bucket]:
+            del buckets[bucket]
+            if not buckets:
+                del self.rangeIndex[widthClass]
+
+    def invalidate(self, bookID):
+        """
+        Drop everything that shows the given book: its record and all the ranges containing its ID.
 
-                if s.left.color == 0 and s.right.color == 0:
-                    # Case 2: Both nephews are black, paint sibling red.
-                    if s.color == 0:
-                        self.colorFlips += 1
-                    s.color = 1
-                    x = x.parent
-                else:
-                    # Case 3: At least one nephew is red, perform rotations.
-                    if s.right.color == 0:
-                        if s.left.color == 1:
-                            self.colorFlips += 1
-                        s.left.color = 0
-                        if s.color == 0:
-                            self.colorFlips += 1
-                        s.color = 1
-                        self.rightRotate(s)
-                        s = x.parent.right
+        Params:
+            - bookID (int): ID of the changed book
 
-                    if s.color != x.parent.color:
-                        self.colorFlips += 1
-                    s.color = x.parent.color
-                    if x.parent.color == 1:
-                        self.colorFlips += 1
-                    x.parent.color = 0
-                    if s.right.color == 1:
-                        self.colorFlips += 1
-                    s.right.color = 0
-                    self.leftRotate(x.parent)
-                    x = self.root
-            else:
-                s = x.parent.left  # Sibling node
-                if s.color == 1:
-                    # Case 1: Sibling is red, perform a color flip.
-                    if s.color == 1:
-                        self.colorFlips += 1
-                    s.color = 0
-                    if x.parent.color == 0:
-                        self.colorFlips += 1
-                    x.parent.color = 1
-                    self.rightRotate(x.parent)
-                    s = x.parent.left
+        Returns:
+            None
+        """
+        self.books.pop(bookID, None)
+        stale = []
+        for widthClass, buckets in self.rangeIndex.items():
+            # A range containing the ID starts less than 2**widthClass before it
+            for bucket in (bookID >> widthClass, (bookID >> widthClass) - 1):
+                stale.extend(key for key in buckets.get(bucket, ()) if key[0] <= bookID <= key[1])
+        for key in stale:
+            self.removeRange(key)
+
+    def stats(self):
+        """
+        Returns:
+            dict with the hit and miss counters, the number of cached entries and the size of the range results
+        """
+        return {
+            "hits": self.hits, "misses": self.misses, "books": len(self.books), "ranges": len(self.ranges),
+            "rangeBytes": self.rangeBytes,
+        }
 
-                if s.right.color == 0 and s.left.color == 0:
-                    # Case 2: Both nephews are black, paint sibling red.
-                    s.color = 1
-                    x = x.parent
-                else:
-                    # Case 3: At least one nephew is red, perform rotations.
-                    if s.left.color == 0:
-                        if s.right.color == 1:
-                            self.colorFlips += 1
-                        s.right.color = 0
-                        if s.color == 0:
-                            self.colorFlips += 1
-                        s.color = 1
-                        self.leftRotate(s)
-                        s = x.parent.left
 
-                    if s.color != x.parent.color:
-                        self.colorFlips += 1
-                    s.color = x.parent.color
-                    if x.parent.color == 1:
-                        self.colorFlips += 1
-                    x.parent.color = 0
-                    if s.left.color == 1:
-                        self.colorFlips += 1
-                    s.left.color = 0
-                    self.rightRotate(x.parent)
-                    x = self.root
-            x.color = 0
+class CommandClock:
 
-    def __rbTransplant(self, u, v):
+    def __init__(self):
         """
-        Replace one subtree rooted at node 'u' with another subtree rooted at node 'v'.
+        Initialize a logical clock that counts executed commands, for deterministic replay of input files.
+        """
+        self.now = 0
 
-        Params:
-            - u (Node): The node whose subtree is to be replaced
-            - v (Node): The node whose subtree is to replace the subtree rooted at 'u'.
+    def __call__(self):
+        """
+        Returns:
+            int: number of commands executed so far
+        """
+        return self.now
+
+    def tick(self):
+        """
+        Advance the clock by one command.
 
         Returns:
             None
         """
-        if u.parent is None:
-            self.root = v
-        elif u == u.parent.left:
-            u.parent.left = v
-        else:
-            u.parent.right = v
-        v.parent = u.parent
+        self.now += 1
 
-    def deleteNodeHelper(self, node, bookID):
+
+class ExpiryScheduler:
+
+    HOLD = 0
+    LOAN = 1
+
+    def __init__(self, library, holdExpiry=None, loanExpiry=None):
         """
-        Helper for single Node deletion.
+        Initialize the expiry of reservations (holds) and loans of a library.
+
+        All the deadlines are kept in one min-heap, so expiring touches only the entries that are due. Entries
+        are not searched for when a hold is fulfilled or a loan ends; stale ones are skipped when they come due.
 
         Params:
-            - node (Node): a node
-            - bookID (int): ID of a book
+            - library (Library): library whose holds and loans expire; its clock is used for the deadlines
+            - holdExpiry (float): time after which a reservation expires, None for never
+            - loanExpiry (float): time after which a borrowed book is returned, None for never
+        """
+        self.library = library
+        self.holdExpiry = holdExpiry
+        self.loanExpiry = loanExpiry
+        self.deadlines = []  # (deadline, sequence, kind, bookID, patronID, token)
+        self.sequence = 0
+        self.activeLoans = {}  # bookID -> (patronID, start of the loan)
+        library.expiry = self
+
+    def schedule(self, deadline, kind, bookID, patronID, token):
+        """
+        Add a deadline to the heap.
+
+        Params:
+            - deadline (float): time at which the entry expires
+            - kind (int): HOLD or LOAN
+            - bookID (int): ID of the book
+            - patronID (int): ID of the patron
+            - token: reservation tuple of a hold, start time of a loan
 
         Returns:
-             None
+            None
         """
-        z = self.TNULL
-        while node != self.TNULL:  # Search for the node having that value/key and store it in 'z'
-            if node.bookID == bookID:
-                z = node
+        # The sequence number keeps entries with equal deadlines in scheduling order
+        heapq.heappush(self.deadlines, (deadline, self.sequence, kind, bookID, patronID, token))
+        self.sequence += 1
 
-            if node.bookID <= bookID:
-                node = node.right
-            else:
-                node = node.left
+    def holdAdded(self, bookID, reservation):
+        """
+        Schedule the expiry of a reservation added to the waitlist of a book.
 
-        # If Key is not present then deletion not possible so return
-        if z == self.TNULL:
-            print("Cannot find key in the tree")
-            return
+        Params:
+            - bookID (int): ID of the book
+            - reservation (tuple): (patronID, priorityNumber, timestamp) as stored in the reservation heap
 
-        y = z
-        yOriginalColor = y.color
-        if z.left == self.TNULL:
-            x = z.right
-            self.__rbTransplant(z, z.right)
-        elif z.right == self.TNULL:
-            x = z.left
-            self.__rbTransplant(z, z.left)
-        else:
-            y = self.minimum(z.right)
-            yOriginalColor = y.color
-            x = y.right
-            if y.parent == z:
-                x.parent = y
-            else:
-                self.__rbTransplant(y, y.right)
-                y.right = z.right
-                y.right.parent = y
+        Returns:
+            None
+        """
+        if self.holdExpiry is not None:
+            self.schedule(reservation[2] + self.holdExpiry, self.HOLD, bookID, reservation[0], reservation)
 
-            self.__rbTransplant(z, y)
-            y.left = z.left
-            y.left.parent = y
-            y.color = z.color
-        if yOriginalColor == 0:
-            self.deleteFix(x)
+    def loanStarted(self, bookID, patronID):
+        """
+        Schedule the expiry of a loan that has just started.
 
-    def fixInsert(self, node):
+        Params:
+            - bookID (int): ID of the book
+            - patronID (int): ID of the patron borrowing the book
+
+        Returns:
+            None
         """
-        Balance the tree after insertion of a Book
+        if self.loanExpiry is not None:
+            start = self.library.clock()
+            self.activeLoans[bookID] = (patronID, start)
+            self.schedule(start + self.loanExpiry, self.LOAN, bookID, patronID, start)
+
+    def loanEnded(self, bookID):
+        """
+        Forget the loan of a book that was returned or deleted.
 
         Params:
-            - node (Node): a node
+            - bookID (int): ID of the book
 
         Returns:
             None
         """
-        while node.parent.color == 1:  # While parent is red
-            if node.parent == node.parent.parent.right:
-                u = node.parent.parent.left  # Uncle node
-                if u.color == 1:
-                    # Case 1: Uncle is red, perform a color flip.
-                    self.colorFlips += 1
-                    u.color = 0  # Uncle becomes black
-                    if node.parent.color == 1:
-                        self.colorFlips += 1
-                    node.parent.color = 0  # Parent becomes black
-                    if node.parent.parent.color == 0:
-                        self.colorFlips += 1
-                    node.parent.parent.color = 1  # Grandparent becomes red
-                    node = node.parent.parent
-                else:
-                    # Case 2: Uncle is black, perform rotations.
-                    if node == node.parent.left:
-                        node = node.parent
+        self.activeLoans.pop(bookID, None)
+
+    def expireDue(self):
+        """
+        Expire every hold and loan whose deadline has passed. Expired holds are removed from their waitlists and
+        books of expired loans are returned, which allots them to the next reservation like ReturnBook does.
+
+        Returns:
+            None
+        """
+        now = self.library.clock()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, kind, bookID, patronID, token = heapq.heappop(self.deadlines)
+            if kind == self.HOLD:
+                if self.library.cancelReservation(bookID, token):
+                    print(f"Reservation made by Patron {patronID} for Book {bookID} has expired\n")
+                    self.library.publishChange("HoldExpired", bookID, (patronID,))
+            elif self.activeLoans.get(bookID) == (patronID, token):
+                print(f"Loan of Book {bookID} by Patron {patronID} has expired\n")
+                self.library.publishChange("LoanExpired", bookID, (patronID,))
+                self.library.returnBook(patronID, bookID)
+
+
+# A change published by a library: sequence numbers are consecutive per feed, patronIDs lists the patrons concerned
+ChangeEvent = collections.namedtuple("ChangeEvent", ["sequence", "kind", "bookID", "patronIDs"])
+
+
+class Subscription:
+
+    BLOCK = "block"  # A full queue blocks the publisher until the consumer catches up
+    DROP_OLDEST = "drop-oldest"  # A full queue discards its oldest event
+
+    def __init__(self, feed, maxSize, overflow):
+        """
+        Initialize a bounded queue of change events for one consumer.
+
+        Threads wait for events on a condition variable. Asyncio consumers wait on a future of their own event
+        loop instead, which publishing completes with call_soon_threadsafe, so no thread is kept waiting for them.
+
+        Params:
+            - feed (ChangeFeed): feed publishing the events
+            - maxSize (int): maximum number of queued events
+            - overflow (str): BLOCK or DROP_OLDEST, what publishing does when the queue is full. With BLOCK, the
+              library must not publish from the thread running the event loop of an asyncio consumer, as that
+              consumer could never catch up
+        """
+        self.feed = feed
+        self.maxSize = maxSize
+        self.overflow = overflow
+        self.events = collections.deque()
+        self.condition = threading.Condition()
+        self.waiters = []  # (loop, future) of the asyncio consumers waiting for an event
+        self.closed = False
+        self.dropped = 0
+
+    @staticmethod
+    def wakeWaiter(waiter):
+        """
+        Complete the future of a waiting asyncio consumer. Runs in the event loop of the consumer.
+
+        Params:
+            - waiter (asyncio.Future): future the consumer is waiting on
+
+        Returns:
+            None
+        """
+        # The consumer may have been cancelled meanwhile
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def wakeWaiters(self):
+        """
+        Wake all the waiting asyncio consumers. Must be called with the condition held.
+
+        Returns:
+            None
+        """
+        for loop, waiter in self.waiters:
+            try:
+                loop.call_soon_threadsafe(self.wakeWaiter, waiter)
+            except RuntimeError:
+                # The event loop of the consumer was closed, nobody is waiting on the future anymore
+                pass
+        self.waiters.clear()
+
+    def offer(self, event):
+        """
+        Queue an event, applying the overflow policy if the queue is full.
+
+        Params:
+            - event (ChangeEvent): published event
+
+        Returns:
+            None
+        """
+        with self.condition:
+            if self.overflow == self.BLOCK:
+                while len(self.events) >= self.maxSize and not self.closed:
+                    self.condition.wait()
+            elif len(self.events) >= self.maxSize:
+                self.events.popleft()
+                self.dropped += 1
+            if self.closed:
+                return
+            self.events.append(event)
+            self.condition.notify_all()
+            self.wakeWaiters()
+
+    def get(self, timeout=None):
+        """
+        Take the next event, waiting for one to be published.
+
+        Params:
+            - timeout (float): maximum time to wait, None to wait until an event arrives or the subscription closes
+
+        Returns:
+            ChangeEvent, or None if the subscription was closed or the timeout passed
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.events or self.closed, timeout):
+                return None
+            if not self.events:
+                return None
+            event = self.events.popleft()
+            self.condition.notify_all()
+            return event
+
+    def close(self):
+        """
+        Stop receiving events. Events already queued can still be taken.
+
+        Returns:
+            None
+        """
+        self.feed.unsubscribe(self)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            self.wakeWaiters()
+
+    def __iter__(self):
+        """
+        Iterate over the events until the subscription is closed.
+        """
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Take the next event without blocking the event loop, for consumers running in asyncio.
+
+        Returns:
+            ChangeEvent
+
+        Raises:
+            StopAsyncIteration: If the subscription was closed and all its events were taken
+        """
+        while True:
+            with self.condition:
+                if self.events:
+                    event = self.events.popleft()
+                    # Publishers blocked on a full queue can go on
+                    self.condition.notify_all()
+                    return event
+                if self.closed:
+                    raise StopAsyncIteration
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self.waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                # A cancelled consumer must not stay registered
+                with self.condition:
+                    if (loop, waiter) in self.waiters:
+                        self.waiters.remove((loop, waiter))
+
+
+class ChangeFeed:
+
+    def __init__(self, library):
+        """
+        Initialize the change feed of a library. The library publishes an event for every change of its
+        circulation state: Inserted, Borrowed, Reserved, Returned, Allotted, Cancelled, Deleted, HoldExpired
+        and LoanExpired.
+
+        Params:
+            - library (Library): library publishing the events
+        """
+        self.sequence = 0
+        self.subscriptions = []
+        self.callbacks = []
+        library.changeFeed = self
+
+    def subscribe(self, maxSize=1024, overflow=Subscription.BLOCK):
+        """
+        Subscribe with a bounded queue, to be consumed by iterating over it (also asynchronously) or with get.
+
+        Params:
+            - maxSize (int): maximum number of queued events
+            - overflow (str): Subscription.BLOCK to apply backpressure to the library when the queue is full,
+              Subscription.DROP_OLDEST to discard the oldest event instead
+
+        Returns:
+            Subscription
+        """
+        subscription = Subscription(self, maxSize, overflow)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription; it receives no more events.
+
+        Params:
+            - subscription (Subscription): subscription to remove
+
+        Returns:
+            None
+        """
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def subscribeCallback(self, callback):
+        """
+        Subscribe a function called synchronously with every event, while the change is being made.
+
+        Params:
+            - callback (callable): function taking a ChangeEvent
+
+        Returns:
+            None
+        """
+        self.callbacks.append(callback)
+
+    def publish(self, kind, bookID, patronIDs=()):
+        """
+        Deliver an event to all the subscribers.
+
+        Params:
+            - kind (str): kind of change
+            - bookID (int): ID of the changed book
+            - patronIDs (tuple): IDs of the patrons concerned by the change
+
+        Returns:
+            None
+        """
+        event = ChangeEvent(self.sequence, kind, bookID, tuple(patronIDs))
+        self.sequence += 1
+        for callback in self.callbacks:
+            callback(event)
+        # Subscriptions may be closed by their consumers while the event is being delivered
+        for subscription in list(self.subscriptions):
+            subscription.offer(event)
+
+
+class MetadataStore:
+
+    def __init__(self, library, memoryBudget, path=""):
+        """
+        Initialize the cold tier of a library: titles and authors are kept in an SQLite database on disk and
+        only a bounded LRU working set of them stays in memory. The tree keeps the keys and circulation state.
+
+        The database is scratch space for this library only: its keys are allocated by the running process, so it
+        is deleted when the store is closed and an existing file is never written to.
+
+        Params:
+            - library (Library): library whose book metadata is moved to disk; it must still be empty
+            - memoryBudget (int): maximum size in bytes of the titles and authors kept in memory
+            - path (str): new database file, "" for a temporary file chosen by SQLite
+
+        Raises:
+            ValueError: If the file already exists and is not empty, or if the library caches rendered output,
+            which keeps titles and authors in memory outside of the budget
+        """
+        if library.renderCache is not None:
+            raise ValueError("The render cache keeps titles and authors in memory outside of the metadata budget")
+        if path and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise ValueError(f"Metadata file already exists: {path}")
+        self.memoryBudget = memoryBudget
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE metadata (key INTEGER PRIMARY KEY, title TEXT, author TEXT)")
+        self.resident = collections.OrderedDict()  # key -> (title, author)
+        self.residentBytes = 0
+        self.nextKey = 0
+        self.hits = 0
+        self.faults = 0
+        library.metadataStore = self
+
+    @staticmethod
+    def recordSize(record):
+        """
+        Returns:
+            int: memory used by the strings of a (title, author) record
+        """
+        return sys.getsizeof(record[0]) + sys.getsizeof(record[1])
+
+    def newKey(self):
+        """
+        Returns:
+            int: a key that was never used in this store
+        """
+        self.nextKey += 1
+        return self.nextKey
+
+    def makeResident(self, key, record):
+        """
+        Keep a record in memory as the most recently used one, evicting the least recently used records while
+        the working set is over the memory budget.
+
+        Params:
+            - key (int): key of the record
+            - record (tuple): (title, author)
+
+        Returns:
+            None
+        """
+        self.resident[key] = record
+        self.residentBytes += self.recordSize(record)
+        while self.residentBytes > self.memoryBudget and self.resident:
+            _, evicted = self.resident.popitem(last=False)
+            self.residentBytes -= self.recordSize(evicted)
+
+    def put(self, key, title, author):
+        """
+        Store the metadata of a book, replacing any record with the same key.
+
+        Params:
+            - key (int): key of the record
+            - title (str): Name of the book
+            - author (str): Name of the author of the book
+
+        Returns:
+            None
+        """
+        self.remove(key)
+        self.connection.execute("INSERT INTO metadata VALUES (?, ?, ?)", (key, title, author))
+        self.makeResident(key, (title, author))
+
+    def get(self, key):
+        """
+        Get the metadata of a book, faulting it in from disk if it is not resident.
+
+        Params:
+            - key (int): key of the record
+
+        Returns:
+            tuple: (title, author)
+        """
+        record = self.resident.get(key)
+        if record is not None:
+            self.resident.move_to_end(key)
+            self.hits += 1
+            return record
+        self.faults += 1
+        record = self.connection.execute("SELECT title, author FROM metadata WHERE key = ?", (key,)).fetchone()
+        self.makeResident(key, record)
+        return record
+
+    def remove(self, key):
+        """
+        Delete the metadata of a book.
+
+        Params:
+            - key (int): key of the record
+
+        Returns:
+            None
+        """
+        record = self.resident.pop(key, None)
+        if record is not None:
+            self.residentBytes -= self.recordSize(record)
+        self.connection.execute("DELETE FROM metadata WHERE key = ?", (key,))
+
+    def stats(self):
+        """
+        Returns:
+            dict with the hit and fault counters and the size of the resident working set
+        """
+        return {
+            "hits": self.hits, "faults": self.faults, "resident": len(self.resident),
+            "residentBytes": self.residentBytes,
+        }
+
+    def close(self):
+        """
+        Close and delete the database.
+
+        Returns:
+            None
+        """
+        self.connection.close()
+        if self.path:
+            os.remove(self.path)
+
+
+class Library:
+    """
+    Circulation layer shared by the tree backends: borrowing, returning, reservations, deletion and printing of
+    books, with the render cache, expiry, change feed and metadata store hooks.
+
+    A backend stores the books in its own structure and refers to a book by a handle (a Node, or a slot index).
+    It implements the index operations (searchTreeHelper, insertNode, deleteNodeHelper, inOrderPrintBooks or
+    scanBooks, iterBooks, iterRecords, resolveMany, closestBooks) and the accessors of the state of a book given
+    its handle. searchTreeHelper and deleteNodeHelper start from the backend's root, and searchTreeHelper returns
+    its TNULL handle when the book is not found.
+
+    Book IDs are expected to be unique, as in the input files. With duplicate IDs every backend keeps all the
+    books, but which of the duplicates a lookup or a deletion resolves depends on the backend.
+    """
+
+    NO_BORROWER = -(1 << 63)  # borrowedBy value of a book that is not borrowed, in the int64 columns
+
+    def __init__(self, cacheSize=0, cacheRangeBytes=1 << 20):
+        """Initialize the state shared by all the backends
+
+        Params:
+            - cacheSize (int): size of the cache of rendered PrintBook/PrintBooks output, 0 disables it
+            - cacheRangeBytes (int): memory available to the cached PrintBooks results
+        """
+        self.colorFlips = 0
+        self.renderCache = RenderCache(cacheSize, cacheRangeBytes) if cacheSize > 0 else None
+        self.clock = time.time  # Source of reservation timestamps, replaceable for deterministic replay
+        self.expiry = None  # ExpiryScheduler of holds and loans, if they expire
+        self.changeFeed = None  # ChangeFeed publishing the changes, if there are subscribers
+        self.metadataStore = None  # MetadataStore keeping the titles and authors on disk, if they are tiered
+
+    def invalidateRendered(self, bookID):
+        """
+        Drop the cached output showing a book that is about to change.
+
+        Params:
+            - bookID (int): ID of the book
+
+        Returns:
+            None
+        """
+        if self.renderCache is not None:
+            self.renderCache.invalidate(bookID)
+
+    def publishChange(self, kind, bookID, patronIDs=()):
+        """
+        Publish a change of a book to the change feed.
+
+        Params:
+            - kind (str): kind of change, see ChangeFeed
+            - bookID (int): ID of the book
+            - patronIDs (tuple): IDs of the patrons concerned by the change
+
+        Returns:
+            None
+        """
+        if self.changeFeed is not None:
+            self.changeFeed.publish(kind, bookID, patronIDs)
+
+    def addReservation(self, bookID, patronID, priorityNumber):
+        """
+        Adds a new reservation (PatronID) to the min-heap
+
+        Params:
+            - bookID (int): ID of Book
+            - patronID (int): ID of Patron
+            - priorityNumber (int): Priority
+
+        Returns:
+            None
+        """
+        node = self.searchTreeHelper(self.root, bookID)
+        if node != self.TNULL:
+            self.invalidateRendered(bookID)
+            timestamp = self.clock()  # High precision timestamp
+            reservation = (patronID, priorityNumber, timestamp)
+            if self.reservationHeapOf(node, create=True).insertReservation(reservation):
+                if self.expiry is not None:
+                    self.expiry.holdAdded(bookID, reservation)
+                self.publishChange("Reserved", bookID, (patronID,))
+        else:
+            print(f"Book {bookID} not found in the library\n")
+
+    def cancelReservation(self, bookID, reservation):
+        """
+        Remove a reservation from the waitlist of a book.
+
+        Params:
+            - bookID (int): ID of Book
+            - reservation (tuple): reservation as stored in the reservation heap
+
+        Returns:
+            bool: True if the reservation was still on the waitlist
+        """
+        node = self.searchTreeHelper(self.root, bookID)
+        heap = self.reservationHeapOf(node) if node != self.TNULL else None
+        if heap is None or reservation not in heap.heap:
+            return False
+        self.invalidateRendered(bookID)
+        return heap.removeReservation(reservation)
+
+    def printBook(self, bookID):
+        """
+        Print information about a specific book identified by its unique bookID.
+
+        Params:
+            - bookID (int): ID of the book
+
+        Returns:
+            None
+        """
+        node = self.searchTreeHelper(self.root, bookID)
+        if node != self.TNULL:
+            self.printBookDetails(node)
+        else:
+            print(f"Book {bookID} not found in the library\n")
+
+    def printBooks(self, bookID1, bookID2):
+        """
+        Print information about all books with bookIDs in the given range.
+
+        Params:
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
+
+        Returns:
+             None
+        """
+        if self.renderCache is None:
+            self.scanBooks(bookID1, bookID2)
+            return
+
+        text = self.renderCache.lookupRange(bookID1, bookID2)
+        if text is None:
+            # Render the range once and keep the text for the next identical query
+            buffer = io.StringIO()
+            with contextlib.redirect_stdout(buffer):
+                self.scanBooks(bookID1, bookID2)
+            text = buffer.getvalue()
+            self.renderCache.storeRange(bookID1, bookID2, text)
+        print(text, end="")
+
+    def scanBooks(self, bookID1, bookID2):
+        """
+        Print the details of the books in the given range by traversing the tree.
+
+        Params:
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
+
+        Returns:
+             None
+        """
+        self.inOrderPrintBooks(self.root, bookID1, bookID2)
+
+    def bookRecord(self, node):
+        """
+        Get the details of a Book as printed by printBookDetails, as a structured record.
+
+        Params:
+            - node: handle of a book
+
+        Returns:
+            tuple: (bookID, title, author, availability, borrowedBy, reservations) with the reservations as a list
+            of patron IDs in waitlist order
+        """
+        bookName, authorName = self.bookMetadata(node)
+        return (
+            self.bookIDOf(node),
+            bookName,
+            authorName,
+            self.availabilityStatus(node),
+            self.borrowerOf(node),
+            [res[0] for res in self.sortReservations(node)],
+        )
+
+    def iterRecords(self, bookID1, bookID2):
+        """
+        Iterate over the records of the books in the given range in order, as returned by bookRecord.
+        Backends override it to read the fields straight from their storage.
+
+        Params:
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
+
+        Returns:
+            An iterator of the records in the range
+        """
+        return map(self.bookRecord, self.iterBooks(bookID1, bookID2))
+
+    def lookupMany(self, ids):
+        """
+        Look up many books at once and return their circulation state as columns.
+
+        Params:
+            - ids: sequence (or NumPy array) of book IDs, in any order and possibly repeated
+
+        Returns:
+            dict of columns in the order of the given IDs:
+                - bookID (array): the given IDs
+                - found (bytearray): 1 if the book is in the library
+                - availability (bytearray): 1 if PrintBook shows Availability = "Yes"
+                - borrowedBy (array): ID of the patron who borrowed the book, NO_BORROWER if it is not borrowed or
+                  not found
+                - waitlistLength (array): number of reservations of the book
+        """
+        ids = [int(bookID) for bookID in ids]
+        nodes = self.resolveMany(sorted(set(ids)))
+        columns = {
+            "bookID": array.array("q", ids),
+            "found": bytearray(len(ids)),
+            "availability": bytearray(len(ids)),
+            "borrowedBy": array.array("q", [self.NO_BORROWER]) * len(ids),
+            "waitlistLength": array.array("l", [0]) * len(ids),
+        }
+        for i, bookID in enumerate(ids):
+            node = nodes.get(bookID)
+            if node is not None:
+                heap = self.reservationHeapOf(node)
+                borrowedBy = self.borrowerOf(node)
+                columns["found"][i] = 1
+                columns["availability"][i] = self.availabilityStatus(node) == "Yes"
+                if borrowedBy is not None:
+                    columns["borrowedBy"][i] = borrowedBy
+                columns["waitlistLength"][i] = len(heap.heap) if heap is not None else 0
+        return columns
+
+    def availabilityMany(self, ids):
+        """
+        Check the availability of many books at once.
+
+        Params:
+            - ids: sequence (or NumPy array) of book IDs, in any order and possibly repeated
+
+        Returns:
+            dict of columns in the order of the given IDs:
+                - found (bytearray): 1 if the book is in the library
+                - availability (bytearray): 1 if PrintBook shows Availability = "Yes"
+        """
+        ids = [int(bookID) for bookID in ids]
+        nodes = self.resolveMany(sorted(set(ids)))
+        found = bytearray(len(ids))
+        availability = bytearray(len(ids))
+        for i, bookID in enumerate(ids):
+            node = nodes.get(bookID)
+            if node is not None:
+                found[i] = 1
+                availability[i] = self.availabilityStatus(node) == "Yes"
+        return {"found": found, "availability": availability}
+
+    def insertBook(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Insert a book into the library.
+
+        Params:
+            - bookID (int): ID of the book
+            - bookName (str): Name of the book
+            - authorName (str): Name of the authorName
+            - availability (str): Status of availability of the book
+
+        Returns:
+             None
+        """
+        self.invalidateRendered(bookID)
+        self.insertNode(bookID, bookName, authorName, availabilityStatus)
+        self.publishChange("Inserted", bookID)
+
+    def borrowBook(self, patronID, bookID, patronPriority):
+        """
+        Allow a patron to borrow a book that is available and update the status of the book.
+
+        Params:
+            - patronID (int): ID of the patron
+            - bookID (int): ID of the book
+            - patronPriority (int): Priority of the patron
+
+        Returns:
+             None
+        """
+        # Search for the book in the tree using its ID
+        node = self.searchTreeHelper(self.root, bookID)
+        if node != self.TNULL:
+            self.invalidateRendered(bookID)
+            # If the book is found and is available for borrowing
+            if self.isAvailable(node) and self.borrowerOf(node) != patronID:
+                self.setAvailability(node, False)  # Set the book as borrowed and update the borrower's ID
+                self.setBorrower(node, patronID)
+                print(f"Book {bookID} Borrowed by Patron {patronID}\n")
+                self.publishChange("Borrowed", bookID, (patronID,))
+                if self.expiry is not None:
+                    self.expiry.loanStarted(bookID, patronID)
+            else:
+                # If the book is not available, add the patron's reservation
+                # The reservation is added to the book's min-heap based on priority
+                self.addReservation(bookID, patronID, patronPriority)
+                print(f"Book {bookID} Reserved by Patron {patronID}\n")
+        else:
+            # If the book is not found in the library
+            print(f"Book {bookID} not found in the library\n")
+
+    def returnBook(self, patronID, bookID):
+        """
+        Allow a patron to return a borrowed book. Update the book's status and assign the book to the patron with
+        highest priority in the Reservation Heap.
+
+        Params:
+            - patronID (int): ID of the patron
+            - bookID (int): ID of thr book
+
+        Returns:
+            None
+        """
+        node = self.searchTreeHelper(self.root, bookID)
+        if node != self.TNULL:
+            if self.borrowerOf(node) == patronID:
+                self.invalidateRendered(bookID)
+                self.setAvailability(node, True)
+                self.setBorrower(node, None)
+                print(f"Book {bookID} Returned by Patron {patronID}\n")
+                self.publishChange("Returned", bookID, (patronID,))
+                if self.expiry is not None:
+                    self.expiry.loanEnded(bookID)
+
+                # Check if there are reservations and assign to the next patron
+                heap = self.reservationHeapOf(node)
+                if heap is not None and len(heap.heap) > 0:
+                    nextReservation = heap.extractMin()
+                    self.setAvailability(node, False)
+                    self.setBorrower(node, nextReservation[0])
+                    print(f"Book {bookID} Allotted to Patron {nextReservation[0]}\n")
+                    self.publishChange("Allotted", bookID, (nextReservation[0],))
+                    if self.expiry is not None:
+                        self.expiry.loanStarted(bookID, nextReservation[0])
+            else:
+                print(f"Patron {patronID} cannot return a book they haven't borrowed")
+        else:
+            print(f"Book {bookID} not found in the library\n")
+
+    def deleteBook(self, bookID):
+        """
+        Delete the book from the library and notify the patrons in the reservation list that the book is no longer
+        available to borrow.
+
+        Params:
+            - bookID (int): ID of the book
+
+        Returns:
+            None
+        """
+        node = self.searchTreeHelper(self.root, bookID)  # Search for the node (book) in the tree by its book ID
+        if node != self.TNULL:
+            self.invalidateRendered(bookID)
+            # If the book is found, process the reservation list
+            patronList = []
+            # Extract and collect patrons from the book's reservation heap
+            heap = self.reservationHeapOf(node)
+            while heap is not None and len(heap.heap) > 0:
+                nextReservation = heap.extractMin()
+                patronList.append(str(nextReservation[0]))
+            # Notify the patrons that the book is no longer available
+            if len(patronList) == 0:
+                print(f"Book {bookID} is no longer available\n")
+            elif len(patronList) == 1:
+                print(
+                    f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(patronList)} "
+                    f"has been cancelled!\n"
+                )
+            else:
+                print(
+                    f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(patronList)} "
+                    f"have been cancelled!\n"
+                )
+            if self.expiry is not None:
+                self.expiry.loanEnded(bookID)
+            if patronList:
+                self.publishChange("Cancelled", bookID, [int(patronID) for patronID in patronList])
+            # Delete the book from the tree
+            self.deleteNodeHelper(self.root, bookID)
+            self.publishChange("Deleted", bookID)
+        else:
+            # Handle the case where the bookID is not found in the library
+            print(f"Book {bookID} not found in the library\n")
+
+    def findClosestBook(self, targetID):
+        """
+        Find the book with an ID closest to the given ID. Print all the details about the book.
+
+        Params:
+            - targetID (int): Target book ID
+
+        Returns:
+            None
+        """
+        closestLower, match, closestHigher = self.closestBooks(targetID)
+        if match is not None:
+            # Exact match found
+            self.printBookDetails(match)
+            return
+
+        # Determine the closest book(s) and print details
+        if closestLower is not None and closestHigher is not None:
+            diffLower = targetID - self.bookIDOf(closestLower)
+            diffHigher = self.bookIDOf(closestHigher) - targetID
+            if diffLower <= diffHigher:
+                self.printBookDetails(closestLower)
+            # In case of a tie, print both, ordered by book IDs
+            if diffHigher <= diffLower:
+                self.printBookDetails(closestHigher)
+        elif closestLower is not None:
+            self.printBookDetails(closestLower)
+        elif closestHigher is not None:
+            self.printBookDetails(closestHigher)
+        else:
+            print("No closest book found")
+
+    def colorFlipCount(self):
+        """
+        Tracks the occurrence of color changes in the tree nodes during the operations.
+
+        Returns:
+            None
+        """
+        print(f"Colour Flip Count: {self.colorFlips}\n")
+
+    def sortReservations(self, node):
+        """
+        Sort the reservations by Priority and timestamp.
+
+        Params:
+            - node: handle of a book
+
+        Returns:
+            list of the reservations in waitlist order
+        """
+        heap = self.reservationHeapOf(node)
+        return sorted(heap.heap, key=lambda x: (x[1], x[2])) if heap is not None else []
+
+    def formatBookDetails(self, node):
+        """
+        Render the details of a Book as printed by printBookDetails
+
+        Params:
+            - node: handle of a book
+
+        Returns:
+            str: the rendered details
+        """
+        bookName, authorName = self.bookMetadata(node)
+        borrowedBy = self.borrowerOf(node)
+        return (
+            f"BookID = {self.bookIDOf(node)}\n"
+            f'Title = "{bookName}"\n'
+            f'Author = "{authorName}"\n'
+            f'Availability = "{self.availabilityStatus(node)}"\n'
+            f"BorrowedBy = {borrowedBy if borrowedBy is not None else 'None'}\n"
+            f"Reservations = {[res[0] for res in self.sortReservations(node)]}\n\n"
+        )
+
+    def printBookDetails(self, node):
+        """
+        Print details of a Book, reusing the cached rendering if it is still valid
+
+        Params:
+            - node: handle of a book
+
+        Returns:
+            None
+        """
+        if self.renderCache is None:
+            print(self.formatBookDetails(node), end="")
+            return
+
+        bookID = self.bookIDOf(node)
+        text = self.renderCache.lookupBook(bookID, node)
+        if text is None:
+            text = self.formatBookDetails(node)
+            self.renderCache.storeBook(bookID, node, text)
+        print(text, end="")
+
+
+class NodeLibrary(Library):
+    """
+    Library storing every book in a Node record: the accessors of the backends that keep Nodes in their index,
+    RedBlackTree and SortedBlockIndex.
+    """
+
+    def newNode(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Create the node of a new book, moving its title and author to the metadata store if there is one.
+
+        Params:
+            - bookID (int): ID of the book
+            - bookName (str): Name of the book
+            - authorName (str): Name of the author
+            - availabilityStatus (str): Status of availability of the book
+
+        Returns:
+            node (Node): the new node
+        """
+        if self.metadataStore is None:
+            return Node(bookID, bookName, authorName, availabilityStatus)
+        node = Node(bookID, None, None, availabilityStatus)
+        node.metadataKey = self.metadataStore.newKey()
+        self.metadataStore.put(node.metadataKey, bookName, authorName)
+        return node
+
+    def releaseNode(self, node):
+        """
+        Drop the stored title and author of a node removed from the tree.
+
+        Params:
+            - node (Node): the removed node
+
+        Returns:
+            None
+        """
+        if self.metadataStore is not None:
+            self.metadataStore.remove(node.metadataKey)
+
+    def bookMetadata(self, node):
+        """
+        Get the title and author of a book, faulting them in from the metadata store if needed.
+
+        Params:
+            - node (Node): a node
+
+        Returns:
+            tuple: (bookName, authorName)
+        """
+        if self.metadataStore is None:
+            return node.bookName, node.authorName
+        return self.metadataStore.get(node.metadataKey)
+
+    def bookIDOf(self, node):
+        """
+        Returns:
+            int: ID of the book of a node
+        """
+        return node.bookID
+
+    def isAvailable(self, node):
+        """
+        Returns:
+            bool: True if the book of a node can be borrowed
+        """
+        return bool(node.availability)
+
+    def availabilityStatus(self, node):
+        """
+        Returns:
+            str: availability of the book of a node as printed, "Yes" or "No"
+        """
+        return "Yes" if node.availability == "Yes" else "No"
+
+    def setAvailability(self, node, available):
+        """
+        Mark the book of a node as available (returned) or not (borrowed).
+
+        Returns:
+            None
+        """
+        node.availability = available
+
+    def borrowerOf(self, node):
+        """
+        Returns:
+            int: ID of the patron who borrowed the book of a node, None if it is not borrowed
+        """
+        return node.borrowedBy
+
+    def setBorrower(self, node, patronID):
+        """
+        Set the patron who borrowed the book of a node, None if it is not borrowed.
+
+        Returns:
+            None
+        """
+        node.borrowedBy = patronID
+
+    def reservationHeapOf(self, node, create=False):
+        """
+        Returns:
+            BinaryMinHeap: reservation heap of the book of a node
+        """
+        return node.reservationHeap
+
+    def iterRecords(self, bookID1, bookID2):
+        """
+        Iterate over the records of the books in the given range in order, reading the fields of the nodes
+        directly instead of through the accessors.
+
+        Params:
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
+
+        Returns:
+            A generator of the records in the range, as returned by bookRecord
+        """
+        metadataStore = self.metadataStore
+        for node in self.iterBooks(bookID1, bookID2):
+            if metadataStore is None:
+                bookName, authorName = node.bookName, node.authorName
+            else:
+                bookName, authorName = metadataStore.get(node.metadataKey)
+            heap = node.reservationHeap.heap
+            yield (
+                node.bookID, bookName, authorName, "Yes" if node.availability == "Yes" else "No", node.borrowedBy,
+                [res[0] for res in sorted(heap, key=lambda x: (x[1], x[2]))] if heap else [],
+            )
+
+
+class RedBlackTree(NodeLibrary):
+
+    def __init__(self, cacheSize=0, cacheRangeBytes=1 << 20):
+        """Initialize the tree with a null node (TNULL) representing the end of the tree
+
+        Params:
+            - cacheSize (int): size of the cache of rendered PrintBook/PrintBooks output, 0 disables it
+            - cacheRangeBytes (int): memory available to the cached PrintBooks results
+        """
+        super().__init__(cacheSize, cacheRangeBytes)
+        self.TNULL = Node(0, None, None, False)
+        self.TNULL.color = 0  # Set the initial color of the null node to black
+        self.TNULL.left = None
+        self.TNULL.right = None
+        self.root = self.TNULL  # Root of the tree is initially set to the null node
+
+    def searchTreeHelper(self, node, bookID):
+        """
+        Helper for searching the tree for a specific BookID.
+
+        Params:
+            - node (Node): a node
+            - bookID (int): ID of the book
+
+        Returns:
+            Node that has the BookID
+        """
+        # Base case: If the current node is the null node (TNULL) or the book ID matches
+        if node == self.TNULL or bookID == node.bookID:
+            return node
+
+        # If the book ID is less than the current node's ID, search in the left subtree
+        if bookID < node.bookID:
+            return self.searchTreeHelper(node.left, bookID)
+
+        # Otherwise, search in the right subtree
+        return self.searchTreeHelper(node.right, bookID)
+
+    def deleteFix(self, x):
+        """
+        Balances the tree after deletion of a Node.
+
+        Params:
+            - node (Node): a node
+            - bookID (int): ID of a book
+
+        Return:
+             None
+        """
+        while x != self.root and x.color == 0:
+            if x == x.parent.left:
+                s = x.parent.right  # Sibling node
+                if s.color == 1:
+                    # Case 1: Sibling is red, perform a color flip.
+                    if s.color == 1:
+                        self.colorFlips += 1
+                    s.color = 0
+                    if x.parent.color == 0:
+                        self.colorFlips += 1
+                    x.parent.color = 1
+                    self.leftRotate(x.parent)
+                    s = x.parent.right
+
+                if s.left.color == 0 and s.right.color == 0:
+                    # Case 2: Both nephews are black, paint sibling red.
+                    if s.color == 0:
+                        self.colorFlips += 1
+                    s.color = 1
+                    x = x.parent
+                else:
+                    # Case 3: At least one nephew is red, perform rotations.
+                    if s.right.color == 0:
+                        if s.left.color == 1:
+                            self.colorFlips += 1
+                        s.left.color = 0
+                        if s.color == 0:
+                            self.colorFlips += 1
+                        s.color = 1
+                        self.rightRotate(s)
+                        s = x.parent.right
+
+                    if s.color != x.parent.color:
+                        self.colorFlips += 1
+                    s.color = x.parent.color
+                    if x.parent.color == 1:
+                        self.colorFlips += 1
+                    x.parent.color = 0
+                    if s.right.color == 1:
+                        self.colorFlips += 1
+                    s.right.color = 0
+                    self.leftRotate(x.parent)
+                    x = self.root
+            else:
+                s = x.parent.left  # Sibling node
+                if s.color == 1:
+                    # Case 1: Sibling is red, perform a color flip.
+                    if s.color == 1:
+                        self.colorFlips += 1
+                    s.color = 0
+                    if x.parent.color == 0:
+                        self.colorFlips += 1
+                    x.parent.color = 1
+                    self.rightRotate(x.parent)
+                    s = x.parent.left
+
+                if s.right.color == 0 and s.left.color == 0:
+                    # Case 2: Both nephews are black, paint sibling red.
+                    s.color = 1
+                    x = x.parent
+                else:
+                    # Case 3: At least one nephew is red, perform rotations.
+                    if s.left.color == 0:
+                        if s.right.color == 1:
+                            self.colorFlips += 1
+                        s.right.color = 0
+                        if s.color == 0:
+                            self.colorFlips += 1
+                        s.color = 1
+                        self.leftRotate(s)
+                        s = x.parent.left
+
+                    if s.color != x.parent.color:
+                        self.colorFlips += 1
+                    s.color = x.parent.color
+                    if x.parent.color == 1:
+                        self.colorFlips += 1
+                    x.parent.color = 0
+                    if s.left.color == 1:
+                        self.colorFlips += 1
+                    s.left.color = 0
+                    self.rightRotate(x.parent)
+                    x = self.root
+        x.color = 0
+
+    def __rbTransplant(self, u, v):
+        """
+        Replace one subtree rooted at node 'u' with another subtree rooted at node 'v'.
+
+        Params:
+            - u (Node): The node whose subtree is to be replaced
+            - v (Node): The node whose subtree is to replace the subtree rooted at 'u'.
+
+        Returns:
+            None
+        """
+        if u.parent is None:
+            self.root = v
+        elif u == u.parent.left:
+            u.parent.left = v
+        else:
+            u.parent.right = v
+        v.parent = u.parent
+
+    def deleteNodeHelper(self, node, bookID):
+        """
+        Helper for single Node deletion.
+
+        Params:
+            - node (Node): a node
+            - bookID (int): ID of a book
+
+        Returns:
+             None
+        """
+        z = self.TNULL
+        while node != self.TNULL:  # Search for the node having that value/key and store it in 'z'
+            if node.bookID == bookID:
+                z = node
+
+            if node.bookID <= bookID:
+                node = node.right
+            else:
+                node = node.left
+
+        # If Key is not present then deletion not possible so return
+        if z == self.TNULL:
+            print("Cannot find key in the tree")
+            return
+
+        self.releaseNode(z)
+        y = z
+        yOriginalColor = y.color
+        if z.left == self.TNULL:
+            x = z.right
+            self.__rbTransplant(z, z.right)
+        elif z.right == self.TNULL:
+            x = z.left
+            self.__rbTransplant(z, z.left)
+        else:
+            y = self.minimum(z.right)
+            yOriginalColor = y.color
+            x = y.right
+            if y.parent == z:
+                x.parent = y
+            else:
+                self.__rbTransplant(y, y.right)
+                y.right = z.right
+                y.right.parent = y
+
+            self.__rbTransplant(z, y)
+            y.left = z.left
+            y.left.parent = y
+            y.color = z.color
+        if yOriginalColor == 0:
+            self.deleteFix(x)
+
+    def fixInsert(self, node):
+        """
+        Balance the tree after insertion of a Book
+
+        Params:
+            - node (Node): a node
+
+        Returns:
+            None
+        """
+        while node.parent.color == 1:  # While parent is red
+            if node.parent == node.parent.parent.right:
+                u = node.parent.parent.left  # Uncle node
+                if u.color == 1:
+                    # Case 1: Uncle is red, perform a color flip.
+                    self.colorFlips += 1
+                    u.color = 0  # Uncle becomes black
+                    if node.parent.color == 1:
+                        self.colorFlips += 1
+                    node.parent.color = 0  # Parent becomes black
+                    if node.parent.parent.color == 0:
+                        self.colorFlips += 1
+                    node.parent.parent.color = 1  # Grandparent becomes red
+                    node = node.parent.parent
+                else:
+                    # Case 2: Uncle is black, perform rotations.
+                    if node == node.parent.left:
+                        node = node.parent
                         self.rightRotate(node)
                     if node.parent.color == 1:
                         self.colorFlips += 1
-                    node.parent.color = 0  # Parent becomes black
-                    node.parent.parent.color = 1  # Grandparent becomes red
-                    self.leftRotate(node.parent.parent)
+                    node.parent.color = 0  # Parent becomes black
+                    node.parent.parent.color = 1  # Grandparent becomes red
+                    self.leftRotate(node.parent.parent)
+            else:
+                u = node.parent.parent.right  # Uncle node
+
+                if u.color == 1:
+                    # Case 1: Uncle is red, perform a color flip.
+                    self.colorFlips += 1
+                    u.color = 0  # Uncle becomes black
+                    if node.parent.color == 1:
+                        self.colorFlips += 1
+                    node.parent.color = 0  # Parent becomes black
+                    if node.parent.parent.color == 0:
+                        self.colorFlips += 1
+                    node.parent.parent.color = 1  # Grandparent becomes red
+                    node = node.parent.parent
+                else:
+                    # Case 2: Uncle is black, perform rotations.
+                    if node == node.parent.right:
+                        node = node.parent
+                        self.leftRotate(node)
+                    if node.parent.color == 1:
+                        self.colorFlips += 1
+                    node.parent.color = 0  # Parent becomes black
+                    if node.parent.parent.color == 0:
+                        self.colorFlips += 1
+                    node.parent.parent.color = 1  # Grandparent becomes red
+                    self.rightRotate(node.parent.parent)
+
+            if node == self.root:
+                break
+            if self.root.color == 1:
+                self.colorFlips += 1
+        self.root.color = 0
+
+    def minimum(self, node):
+        """
+        Finds the node with the smallest key in the subtree rooted at the given node.
+
+        Params:
+            - node (Node): root of the subtree
+
+        Returns:
+            node (Node): Node with the smallest key in the subtree
+        """
+        while node.left != self.TNULL:
+            node = node.left
+        return node
+
+    def leftRotate(self, x):
+        """
+        Performs a left rotation around the specified node x
+
+        Params:
+            - x (Node): a node
+
+        Returns:
+            None
+        """
+        y = x.right  # Y = Right child of x
+        x.right = y.left  # Change right child of x to left child of y
+        if y.left != self.TNULL:
+            y.left.parent = x
+
+        y.parent = x.parent  # Change parent of y as parent of x
+        if x.parent is None:
+            self.root = y
+        elif x == x.parent.left:
+            x.parent.left = y
+        else:
+            x.parent.right = y
+        y.left = x
+        x.parent = y
+
+    def rightRotate(self, x):
+        """
+        Performs a right rotation around the specified node x
+
+        Params:
+            - x (Node): a node
+
+        Returns:
+            None
+        """
+        y = x.left  # Y = Left child of x
+        x.left = y.right  # Change left child of x to right child of y
+        if y.right != self.TNULL:
+            y.right.parent = x
+
+        y.parent = x.parent  # Change parent of y as parent of x
+        if x.parent is None:
+            self.root = y
+        elif x == x.parent.right:
+            x.parent.right = y
+        else:
+            x.parent.left = y
+        y.right = x
+        x.parent = y
+
+    def inOrderPrintBooks(self, node, bookID1, bookID2):
+        """
+        In-order traversal of a binary search tree to print book details within a specified range.
+
+        Params:
+            - node (Node): The current node being processed
+            - bookID1 (int): The lower bound of the bookID range
+            - bookID2 (int): The upper bound of the bookID range
+
+        Returns:
+            None
+        """
+        if node is None or node == self.TNULL:
+            return
+
+        # Traverse left subtree if it might contain books within the range
+        if bookID1 < node.bookID:
+            self.inOrderPrintBooks(node.left, bookID1, bookID2)
+
+        # Print the node's book if it's within the range
+        if bookID1 <= node.bookID <= bookID2:
+            self.printBookDetails(node)
+
+        # Traverse right subtree if it might contain books within the range
+        if bookID2 > node.bookID:
+            self.inOrderPrintBooks(node.right, bookID1, bookID2)
+
+    def iterBooks(self, bookID1, bookID2):
+        """
+        Iterate over the books in the given range in order, with an explicit stack instead of recursion, so the
+        memory used does not depend on the number of books.
+
+        Params:
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
+
+        Returns:
+            A generator of the nodes in the range
+        """
+        stack = []
+        node = self.root
+        while stack or node != self.TNULL:
+            # Go down the left spine as long as the left subtree might contain books within the range
+            while node != self.TNULL:
+                stack.append(node)
+                node = node.left if bookID1 < node.bookID else self.TNULL
+            node = stack.pop()
+            if bookID1 <= node.bookID <= bookID2:
+                yield node
+            node = node.right if bookID2 > node.bookID else self.TNULL
+
+    def resolveMany(self, sortedIDs):
+        """
+        Find the nodes of many books in a single traversal. The sorted IDs are split at every visited node
+        between its subtrees, so the paths shared by the IDs are walked only once.
+
+        Params:
+            - sortedIDs (list): sorted, distinct book IDs
+
+        Returns:
+            dict mapping each found bookID to its node
+        """
+        found = {}
+        stack = [(self.root, 0, len(sortedIDs))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if node == self.TNULL or lo >= hi:
+                continue
+            mid = bisect.bisect_left(sortedIDs, node.bookID, lo, hi)
+            if mid < hi and sortedIDs[mid] == node.bookID:
+                found[node.bookID] = node
+                stack.append((node.right, mid + 1, hi))
+            else:
+                stack.append((node.right, mid, hi))
+            stack.append((node.left, lo, mid))
+        return found
+
+    def insertNode(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Insert a book as a Node.
+
+        Params:
+            - bookID (int): ID of the book
+            - bookName (str): Name of the book
+            - authorName (str): Name of the authorName
+            - availability (str): Status of availability of the book
+
+        Returns:
+             None
+        """
+        node = self.newNode(bookID, bookName, authorName, availabilityStatus)
+        node.parent = None
+        node.left = self.TNULL
+        node.right = self.TNULL
+        node.color = 1  # Set root colour as Red
+
+        y = None
+        x = self.root
+
+        while x != self.TNULL:  # Find position for new node
+            y = x
+            if node.bookID < x.bookID:
+                x = x.left
+            else:
+                x = x.right
+
+        node.parent = y  # Set parent of Node as y
+        if y is None:
+            self.root = node
+        elif node.bookID < y.bookID:  # Check if it is right Node or Left Node by checking the value
+            y.left = node
+        else:
+            y.right = node
+
+        if node.parent is None:  # Root node is always Black
+            node.color = 0
+            return
+
+        if node.parent.parent is None:  # If parent of node is Root Node
+            return
+
+        self.fixInsert(node)  # Else call for Fix Up
+
+    def closestBooks(self, targetID):
+        """
+        Find the books with the closest IDs below and above the given ID, or the book with that ID.
+
+        Params:
+            - targetID (int): Target book ID
+
+        Returns:
+            tuple: (closestLower, match, closestHigher) nodes, None where there is no such book
+        """
+        current = self.root
+        closestLower = None
+        closestHigher = None
+
+        # Traverse the tree to find the closest lower and higher book IDs
+        while current != self.TNULL:
+            if current.bookID < targetID:
+                closestLower = current
+                current = current.right
+            elif current.bookID > targetID:
+                closestHigher = current
+                current = current.left
+            else:
+                # Exact match found
+                return closestLower, current, closestHigher
+        return closestLower, None, closestHigher
+
+
+class ArrayRedBlackTree(Library):
+    """
+    Red-Black Tree storing the books in parallel arrays (struct-of-arrays) instead of Node objects.
+
+    A book lives in a slot: its key, colour, child and parent indexes, availability and borrower are entries
+    of typed arrays at the slot index. Slot 0 is the null node (TNULL), the parent of the root is NONE and
+    slots of deleted books are reused through a free list. The balancing code mirrors RedBlackTree step by
+    step, so that both backends produce identical output, including the colour flip count.
+
+    Book IDs and borrower IDs are stored in int64 arrays, so they must lie between MIN_ID and MAX_ID; the smallest
+    int64 is NO_BORROWER. InsertBook and BorrowBook raise ValueError for IDs outside that range.
+    """
+
+    NONE = -1  # Parent index of the root
+    MIN_ID = Library.NO_BORROWER + 1  # Smallest book or patron ID
+    MAX_ID = (1 << 63) - 1  # Largest book or patron ID
+
+    # Availability codes: the original status strings only matter for being "Yes" and for their truthiness
+    AVAILABLE_FALSE = 0
+    AVAILABLE_TRUE = 1
+    AVAILABLE_YES = 2
+
+    def __init__(self, cacheSize=0, cacheRangeBytes=1 << 20):
+        """Initialize the arrays with the null node (TNULL) in slot 0
+
+        Params:
+            - cacheSize (int): size of the cache of rendered PrintBook/PrintBooks output, 0 disables it
+            - cacheRangeBytes (int): memory available to the cached PrintBooks results
+        """
+        super().__init__(cacheSize, cacheRangeBytes)
+        self.TNULL = 0
+        self.keys = array.array("q", [0])
+        self.colors = bytearray([0])  # The null node is black
+        self.lefts = array.array("i", [0])
+        self.rights = array.array("i", [0])
+        self.parents = array.array("i", [self.NONE])
+        self.availability = bytearray([self.AVAILABLE_FALSE])
+        self.borrowedBy = array.array("q", [self.NO_BORROWER])
+        self.bookNames = [None]
+        self.authorNames = [None]
+        self.reservationHeaps = {}  # Slot -> BinaryMinHeap, only for books that have had reservations
+        self.freeSlots = []
+        self.root = self.TNULL
+
+    def checkID(self, value, name):
+        """
+        Check that an ID fits in the int64 arrays.
+
+        Params:
+            - value (int): the ID
+            - name (str): what the ID identifies, for the error message
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the ID is outside MIN_ID..MAX_ID
+        """
+        if not self.MIN_ID <= value <= self.MAX_ID:
+            raise ValueError(f"{name} {value} is outside the IDs of the array backend ({self.MIN_ID} to {self.MAX_ID})")
+
+    def insertBook(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Insert a book into the library, see Library.insertBook.
+
+        Raises:
+            ValueError: If the book ID does not fit in the int64 arrays
+        """
+        self.checkID(bookID, "Book ID")
+        super().insertBook(bookID, bookName, authorName, availabilityStatus)
+
+    def borrowBook(self, patronID, bookID, patronPriority):
+        """
+        Borrow or reserve a book, see Library.borrowBook.
+
+        Raises:
+            ValueError: If the patron ID does not fit in the int64 arrays
+        """
+        self.checkID(patronID, "Patron ID")
+        super().borrowBook(patronID, bookID, patronPriority)
+
+    def newSlot(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Allocate a slot for a new red node, reusing the slot of a deleted book if there is one.
+
+        Params:
+            - bookID (int): ID of the book
+            - bookName (str): Name of the book
+            - authorName (str): Name of the author of the book
+            - availabilityStatus (str): Availability status of the book
+
+        Returns:
+            slot (int): index of the new node
+        """
+        if availabilityStatus == "Yes":
+            available = self.AVAILABLE_YES
+        else:
+            available = self.AVAILABLE_TRUE if availabilityStatus else self.AVAILABLE_FALSE
+        # Author names repeat a lot across the catalog, keep a single copy of each
+        authorName = sys.intern(authorName)
+        metadata = None
+        if self.metadataStore is not None:
+            # Titles and authors are kept in the store, keyed by slot
+            metadata = (bookName, authorName)
+            bookName = authorName = None
+
+        if self.freeSlots:
+            slot = self.freeSlots.pop()
+            self.keys[slot] = bookID
+            self.colors[slot] = 1
+            self.lefts[slot] = self.TNULL
+            self.rights[slot] = self.TNULL
+            self.parents[slot] = self.NONE
+            self.availability[slot] = available
+            self.borrowedBy[slot] = self.NO_BORROWER
+            self.bookNames[slot] = bookName
+            self.authorNames[slot] = authorName
+        else:
+            slot = len(self.keys)
+            self.keys.append(bookID)
+            self.colors.append(1)
+            self.lefts.append(self.TNULL)
+            self.rights.append(self.TNULL)
+            self.parents.append(self.NONE)
+            self.availability.append(available)
+            self.borrowedBy.append(self.NO_BORROWER)
+            self.bookNames.append(bookName)
+            self.authorNames.append(authorName)
+
+        if metadata is not None:
+            self.metadataStore.put(slot, *metadata)
+        return slot
+
+    def freeSlot(self, slot):
+        """
+        Release the slot of a deleted book for reuse.
+
+        Params:
+            - slot (int): index of the deleted node
+
+        Returns:
+            None
+        """
+        self.bookNames[slot] = None
+        self.authorNames[slot] = None
+        if self.metadataStore is not None:
+            self.metadataStore.remove(slot)
+        self.reservationHeaps.pop(slot, None)
+        self.freeSlots.append(slot)
+
+    def bookMetadata(self, slot):
+        """
+        Get the title and author of a book, faulting them in from the metadata store if needed.
+
+        Params:
+            - slot (int): a node
+
+        Returns:
+            tuple: (bookName, authorName)
+        """
+        if self.metadataStore is None:
+            return self.bookNames[slot], self.authorNames[slot]
+        return self.metadataStore.get(slot)
+
+    def bookIDOf(self, slot):
+        """
+        Returns:
+            int: ID of the book in a slot
+        """
+        return self.keys[slot]
+
+    def isAvailable(self, slot):
+        """
+        Returns:
+            bool: True if the book in a slot can be borrowed
+        """
+        return self.availability[slot] != self.AVAILABLE_FALSE
+
+    def availabilityStatus(self, slot):
+        """
+        Returns:
+            str: availability of the book in a slot as printed, "Yes" or "No"
+        """
+        return "Yes" if self.availability[slot] == self.AVAILABLE_YES else "No"
+
+    def setAvailability(self, slot, available):
+        """
+        Mark the book in a slot as available (returned) or not (borrowed).
+
+        Returns:
+            None
+        """
+        self.availability[slot] = self.AVAILABLE_TRUE if available else self.AVAILABLE_FALSE
+
+    def borrowerOf(self, slot):
+        """
+        Returns:
+            int: ID of the patron who borrowed the book in a slot, None if it is not borrowed
+        """
+        borrowedBy = self.borrowedBy[slot]
+        return borrowedBy if borrowedBy != self.NO_BORROWER else None
+
+    def setBorrower(self, slot, patronID):
+        """
+        Set the patron who borrowed the book in a slot, None if it is not borrowed.
+
+        Returns:
+            None
+        """
+        self.borrowedBy[slot] = patronID if patronID is not None else self.NO_BORROWER
+
+    def reservationHeapOf(self, slot, create=False):
+        """
+        Params:
+            - slot (int): a node
+            - create (bool): create the heap if the book has never had reservations
+
+        Returns:
+            BinaryMinHeap: reservation heap of the book in a slot, None if it has none and create is False
+        """
+        heap = self.reservationHeaps.get(slot)
+        if heap is None and create:
+            heap = self.reservationHeaps[slot] = BinaryMinHeap()
+        return heap
+
+    def searchTreeHelper(self, slot, bookID):
+        """
+        Helper for searching the tree for a specific BookID.
+
+        Params:
+            - slot (int): a node
+            - bookID (int): ID of the book
+
+        Returns:
+            Node that has the BookID, TNULL if there is none
+        """
+        keys, lefts, rights = self.keys, self.lefts, self.rights
+        while slot != self.TNULL and bookID != keys[slot]:
+            slot = lefts[slot] if bookID < keys[slot] else rights[slot]
+        return slot
+
+    def deleteFix(self, x):
+        """
+        Balances the tree after deletion of a Node.
+
+        Params:
+            - x (int): node that took the place of the removed node
+
+        Return:
+             None
+        """
+        colors, lefts, rights, parents = self.colors, self.lefts, self.rights, self.parents
+        while x != self.root and colors[x] == 0:
+            p = parents[x]
+            if x == lefts[p]:
+                s = rights[p]  # Sibling node
+                if colors[s] == 1:
+                    # Case 1: Sibling is red, perform a color flip.
+                    self.colorFlips += 1
+                    colors[s] = 0
+                    if colors[p] == 0:
+                        self.colorFlips += 1
+                    colors[p] = 1
+                    self.leftRotate(p)
+                    s = rights[p]
+
+                if colors[lefts[s]] == 0 and colors[rights[s]] == 0:
+                    # Case 2: Both nephews are black, paint sibling red.
+                    if colors[s] == 0:
+                        self.colorFlips += 1
+                    colors[s] = 1
+                    x = p
+                else:
+                    # Case 3: At least one nephew is red, perform rotations.
+                    if colors[rights[s]] == 0:
+                        if colors[lefts[s]] == 1:
+                            self.colorFlips += 1
+                        colors[lefts[s]] = 0
+                        if colors[s] == 0:
+                            self.colorFlips += 1
+                        colors[s] = 1
+                        self.rightRotate(s)
+                        s = rights[p]
+
+                    if colors[s] != colors[p]:
+                        self.colorFlips += 1
+                    colors[s] = colors[p]
+                    if colors[p] == 1:
+                        self.colorFlips += 1
+                    colors[p] = 0
+                    if colors[rights[s]] == 1:
+                        self.colorFlips += 1
+                    colors[rights[s]] = 0
+                    self.leftRotate(p)
+                    x = self.root
             else:
-                u = node.parent.parent.right  # Uncle node
+                s = lefts[p]  # Sibling node
+                if colors[s] == 1:
+                    # Case 1: Sibling is red, perform a color flip.
+                    self.colorFlips += 1
+                    colors[s] = 0
+                    if colors[p] == 0:
+                        self.colorFlips += 1
+                    colors[p] = 1
+                    self.rightRotate(p)
+                    s = lefts[p]
 
-                if u.color == 1:
+                if colors[rights[s]] == 0 and colors[lefts[s]] == 0:
+                    # Case 2: Both nephews are black, paint sibling red.
+                    colors[s] = 1
+                    x = p
+                else:
+                    # Case 3: At least one nephew is red, perform rotations.
+                    if colors[lefts[s]] == 0:
+                        if colors[rights[s]] == 1:
+                            self.colorFlips += 1
+                        colors[rights[s]] = 0
+                        if colors[s] == 0:
+                            self.colorFlips += 1
+                        colors[s] = 1
+                        self.leftRotate(s)
+                        s = lefts[p]
+
+                    if colors[s] != colors[p]:
+                        self.colorFlips += 1
+                    colors[s] = colors[p]
+                    if colors[p] == 1:
+                        self.colorFlips += 1
+                    colors[p] = 0
+                    if colors[lefts[s]] == 1:
+                        self.colorFlips += 1
+                    colors[lefts[s]] = 0
+                    self.rightRotate(p)
+                    x = self.root
+        colors[x] = 0
+
+    def __rbTransplant(self, u, v):
+        """
+        Replace one subtree rooted at node 'u' with another subtree rooted at node 'v'.
+
+        Params:
+            - u (int): The node whose subtree is to be replaced
+            - v (int): The node whose subtree is to replace the subtree rooted at 'u'.
+
+        Returns:
+            None
+        """
+        parent = self.parents[u]
+        if parent == self.NONE:
+            self.root = v
+        elif u == self.lefts[parent]:
+            self.lefts[parent] = v
+        else:
+            self.rights[parent] = v
+        self.parents[v] = parent
+
+    def deleteNodeHelper(self, slot, bookID):
+        """
+        Helper for single Node deletion.
+
+        Params:
+            - slot (int): a node
+            - bookID (int): ID of a book
+
+        Returns:
+             None
+        """
+        keys, colors, lefts, rights, parents = self.keys, self.colors, self.lefts, self.rights, self.parents
+        z = self.TNULL
+        while slot != self.TNULL:  # Search for the node having that value/key and store it in 'z'
+            if keys[slot] == bookID:
+                z = slot
+
+            if keys[slot] <= bookID:
+                slot = rights[slot]
+            else:
+                slot = lefts[slot]
+
+        # If Key is not present then deletion not possible so return
+        if z == self.TNULL:
+            print("Cannot find key in the tree")
+            return
+
+        y = z
+        yOriginalColor = colors[y]
+        if lefts[z] == self.TNULL:
+            x = rights[z]
+            self.__rbTransplant(z, rights[z])
+        elif rights[z] == self.TNULL:
+            x = lefts[z]
+            self.__rbTransplant(z, lefts[z])
+        else:
+            y = self.minimum(rights[z])
+            yOriginalColor = colors[y]
+            x = rights[y]
+            if parents[y] == z:
+                parents[x] = y
+            else:
+                self.__rbTransplant(y, rights[y])
+                rights[y] = rights[z]
+                parents[rights[y]] = y
+
+            self.__rbTransplant(z, y)
+            lefts[y] = lefts[z]
+            parents[lefts[y]] = y
+            colors[y] = colors[z]
+        self.freeSlot(z)
+        if yOriginalColor == 0:
+            self.deleteFix(x)
+
+    def fixInsert(self, node):
+        """
+        Balance the tree after insertion of a Book
+
+        Params:
+            - node (int): a node
+
+        Returns:
+            None
+        """
+        colors, lefts, rights, parents = self.colors, self.lefts, self.rights, self.parents
+        while colors[parents[node]] == 1:  # While parent is red
+            parent = parents[node]
+            grandparent = parents[parent]
+            if parent == rights[grandparent]:
+                u = lefts[grandparent]  # Uncle node
+                if colors[u] == 1:
                     # Case 1: Uncle is red, perform a color flip.
                     self.colorFlips += 1
-                    u.color = 0  # Uncle becomes black
-                    if node.parent.color == 1:
+                    colors[u] = 0  # Uncle becomes black
+                    self.colorFlips += 1
+                    colors[parent] = 0  # Parent becomes black
+                    if colors[grandparent] == 0:
                         self.colorFlips += 1
-                    node.parent.color = 0  # Parent becomes black
-                    if node.parent.parent.color == 0:
+                    colors[grandparent] = 1  # Grandparent becomes red
+                    node = grandparent
+                else:
+                    # Case 2: Uncle is black, perform rotations.
+                    if node == lefts[parent]:
+                        node = parent
+                        self.rightRotate(node)
+                    parent = parents[node]
+                    if colors[parent] == 1:
                         self.colorFlips += 1
-                    node.parent.parent.color = 1  # Grandparent becomes red
-                    node = node.parent.parent
+                    colors[parent] = 0  # Parent becomes black
+                    colors[parents[parent]] = 1  # Grandparent becomes red
+                    self.leftRotate(parents[parent])
+            else:
+                u = rights[grandparent]  # Uncle node
+
+                if colors[u] == 1:
+                    # Case 1: Uncle is red, perform a color flip.
+                    self.colorFlips += 1
+                    colors[u] = 0  # Uncle becomes black
+                    self.colorFlips += 1
+                    colors[parent] = 0  # Parent becomes black
+                    if colors[grandparent] == 0:
+                        self.colorFlips += 1
+                    colors[grandparent] = 1  # Grandparent becomes red
+                    node = grandparent
                 else:
                     # Case 2: Uncle is black, perform rotations.
-                    if node == node.parent.right:
-                        node = node.parent
+                    if node == rights[parent]:
+                        node = parent
                         self.leftRotate(node)
-                    if node.parent.color == 1:
+                    parent = parents[node]
+                    if colors[parent] == 1:
                         self.colorFlips += 1
-                    node.parent.color = 0  # Parent becomes black
-                    if node.parent.parent.color == 0:
+                    colors[parent] = 0  # Parent becomes black
+                    if colors[parents[parent]] == 0:
                         self.colorFlips += 1
-                    node.parent.parent.color = 1  # Grandparent becomes red
-                    self.rightRotate(node.parent.parent)
+                    colors[parents[parent]] = 1  # Grandparent becomes red
+                    self.rightRotate(parents[parent])
 
             if node == self.root:
                 break
-            if self.root.color == 1:
+            if colors[self.root] == 1:
                 self.colorFlips += 1
-        self.root.color = 0
+        colors[self.root] = 0
 
-    def minimum(self, node):
+    def minimum(self, slot):
         """
         Finds the node with the smallest key in the subtree rooted at the given node.
 
         Params:
-            - node (Node): root of the subtree
+            - slot (int): root of the subtree
 
         Returns:
-            node (Node): Node with the smallest key in the subtree
+            slot (int): Node with the smallest key in the subtree
         """
-        while node.left != self.TNULL:
-            node = node.left
-        return node
+        while self.lefts[slot] != self.TNULL:
+            slot = self.lefts[slot]
+        return slot
 
     def leftRotate(self, x):
         """
         Performs a left rotation around the specified node x
 
         Params:
-            - x (Node): a node
+            - x (int): a node
 
         Returns:
             None
         """
-        y = x.right  # Y = Right child of x
-        x.right = y.left  # Change right child of x to left child of y
-        if y.left != self.TNULL:
-            y.left.parent = x
-
-        y.parent = x.parent  # Change parent of y as parent of x
-        if x.parent is None:
+        lefts, rights, parents = self.lefts, self.rights, self.parents
+        y = rights[x]  # Y = Right child of x
+        rights[x] = lefts[y]  # Change right child of x to left child of y
+        if lefts[y] != self.TNULL:
+            parents[lefts[y]] = x
+
+        parents[y] = parents[x]  # Change parent of y as parent of x
+        if parents[x] == self.NONE:
             self.root = y
-        elif x == x.parent.left:
-            x.parent.left = y
+        elif x == lefts[parents[x]]:
+            lefts[parents[x]] = y
         else:
-            x.parent.right = y
-        y.left = x
-        x.parent = y
+            rights[parents[x]] = y
+        lefts[y] = x
+        parents[x] = y
 
     def rightRotate(self, x):
         """
         Performs a right rotation around the specified node x
 
         Params:
-            - x (Node): a node
+            - x (int): a node
 
         Returns:
             None
         """
-        y = x.left  # Y = Left child of x
-        x.left = y.right  # Change left child of x to right child of y
-        if y.right != self.TNULL:
-            y.right.parent = x
-
-        y.parent = x.parent  # Change parent of y as parent of x
-        if x.parent is None:
+        lefts, rights, parents = self.lefts, self.rights, self.parents
+        y = lefts[x]  # Y = Left child of x
+        lefts[x] = rights[y]  # Change left child of x to right child of y
+        if rights[y] != self.TNULL:
+            parents[rights[y]] = x
+
+        parents[y] = parents[x]  # Change parent of y as parent of x
+        if parents[x] == self.NONE:
             self.root = y
-        elif x == x.parent.right:
-            x.parent.right = y
-        else:
-            x.parent.left = y
-        y.right = x
-        x.parent = y
-
-    def addReservation(self, bookID, patronID, priorityNumber):
-        """
-        Adds a new reservation (PatronID) to the min-heap
-
-        Params:
-            - bookID (int): ID of Book
-            - patronID (int): ID of Patron
-            - priorityNumber (int): Priority
-
-        Returns:
-            None
-        """
-        node = self.searchTreeHelper(self.root, bookID)
-        if node != self.TNULL:
-            timestamp = time.time()  # High precision timestamp
-            node.reservationHeap.insertReservation(
-                (patronID, priorityNumber, timestamp)
-            )
+        elif x == rights[parents[x]]:
+            rights[parents[x]] = y
         else:
-            print(f"Book {bookID} not found in the library\n")
+            lefts[parents[x]] = y
+        rights[y] = x
+        parents[x] = y
 
-    def inOrderPrintBooks(self, node, bookID1, bookID2):
+    def inOrderPrintBooks(self, slot, bookID1, bookID2):
         """
-        In-order traversal of a binary search tree to print book details within a specified range.
+        In-order traversal of the tree to print book details within a specified range.
 
         Params:
-            - node (Node): The current node being processed
+            - slot (int): The current node being processed
             - bookID1 (int): The lower bound of the bookID range
             - bookID2 (int): The upper bound of the bookID range
 
         Returns:
             None
         """
-        if node is None or node == self.TNULL:
+        if slot == self.TNULL:
             return
 
+        bookID = self.keys[slot]
         # Traverse left subtree if it might contain books within the range
-        if bookID1 < node.bookID:
-            self.inOrderPrintBooks(node.left, bookID1, bookID2)
+        if bookID1 < bookID:
+            self.inOrderPrintBooks(self.lefts[slot], bookID1, bookID2)
 
         # Print the node's book if it's within the range
-        if bookID1 <= node.bookID <= bookID2:
-            self.printBookDetails(node)
+        if bookID1 <= bookID <= bookID2:
+            self.printBookDetails(slot)
 
         # Traverse right subtree if it might contain books within the range
-        if bookID2 > node.bookID:
-            self.inOrderPrintBooks(node.right, bookID1, bookID2)
+        if bookID2 > bookID:
+            self.inOrderPrintBooks(self.rights[slot], bookID1, bookID2)
 
-    def printBook(self, bookID):
+    def iterBooks(self, bookID1, bookID2):
         """
-        Print information about a specific book identified by its unique bookID.
+        Iterate over the books in the given range in order, with an explicit stack instead of recursion.
 
         Params:
-            - bookID (int): ID of the book
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
 
         Returns:
-            None
+            A generator of the slots in the range
         """
-        node = self.searchTreeHelper(self.root, bookID)
-        if node != self.TNULL:
-            self.printBookDetails(node)
-        else:
-            print(f"Book {bookID} not found in the library\n")
-
-    def printBooks(self, bookID1, bookID2):
+        keys, lefts, rights = self.keys, self.lefts, self.rights
+        stack = []
+        slot = self.root
+        while stack or slot != self.TNULL:
+            # Go down the left spine as long as the left subtree might contain books within the range
+            while slot != self.TNULL:
+                stack.append(slot)
+                slot = lefts[slot] if bookID1 < keys[slot] else self.TNULL
+            slot = stack.pop()
+            if bookID1 <= keys[slot] <= bookID2:
+                yield slot
+            slot = rights[slot] if bookID2 > keys[slot] else self.TNULL
+
+    def iterRecords(self, bookID1, bookID2):
         """
-        Print information about all books with bookIDs in the given range.
+        Iterate over the records of the books in the given range in order, reading the arrays directly instead
+        of through the accessors.
 
         Params:
             - bookID1 (int): initial BookID
             - bookID2 (int): end BookID
 
         Returns:
-             None
+            A generator of the records in the range, as returned by bookRecord
         """
-        self.inOrderPrintBooks(self.root, bookID1, bookID2)
+        keys, availability, borrowers, heaps = self.keys, self.availability, self.borrowedBy, self.reservationHeaps
+        bookNames, authorNames, metadataStore = self.bookNames, self.authorNames, self.metadataStore
+        for slot in self.iterBooks(bookID1, bookID2):
+            if metadataStore is None:
+                bookName, authorName = bookNames[slot], authorNames[slot]
+            else:
+                bookName, authorName = metadataStore.get(slot)
+            borrowedBy = borrowers[slot]
+            heap = heaps.get(slot)
+            yield (
+                keys[slot], bookName, authorName, "Yes" if availability[slot] == self.AVAILABLE_YES else "No",
+                borrowedBy if borrowedBy != self.NO_BORROWER else None,
+                [res[0] for res in sorted(heap.heap, key=lambda x: (x[1], x[2]))] if heap is not None else [],
+            )
 
-    def insertBook(self, bookID, bookName, authorName, availabilityStatus):
+    def resolveMany(self, sortedIDs):
         """
-        Insert a book as a Node.
+        Find the slots of many books in a single traversal. The sorted IDs are split at every visited node
+        between its subtrees, so the paths shared by the IDs are walked only once.
+
+        Params:
+            - sortedIDs (list): sorted, distinct book IDs
+
+        Returns:
+            dict mapping each found bookID to its slot
+        """
+        keys, lefts, rights = self.keys, self.lefts, self.rights
+        found = {}
+        stack = [(self.root, 0, len(sortedIDs))]
+        while stack:
+            slot, lo, hi = stack.pop()
+            if slot == self.TNULL or lo >= hi:
+                continue
+            bookID = keys[slot]
+            mid = bisect.bisect_left(sortedIDs, bookID, lo, hi)
+            if mid < hi and sortedIDs[mid] == bookID:
+                found[bookID] = slot
+                stack.append((rights[slot], mid + 1, hi))
+            else:
+                stack.append((rights[slot], mid, hi))
+            stack.append((lefts[slot], lo, mid))
+        return found
+
+    def insertNode(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Insert a book into a new slot.
 
         Params:
             - bookID (int): ID of the book
             - bookName (str): Name of the book
-            - authorName (str): Name of the authorName
+            - authorName (str): Name of the author
             - availability (str): Status of availability of the book
 
         Returns:
              None
         """
-        node = Node(bookID, bookName, authorName, availabilityStatus)
-        node.parent = None
-        node.left = self.TNULL
-        node.right = self.TNULL
-        node.color = 1  # Set root colour as Red
+        keys, lefts, rights = self.keys, self.lefts, self.rights
+        slot = self.newSlot(bookID, bookName, authorName, availabilityStatus)
 
-        y = None
+        y = self.NONE
         x = self.root
 
         while x != self.TNULL:  # Find position for new node
             y = x
-            if node.bookID < x.bookID:
-                x = x.left
+            if bookID < keys[x]:
+                x = lefts[x]
             else:
-                x = x.right
+                x = rights[x]
 
-        node.parent = y  # Set parent of Node as y
-        if y is None:
-            self.root = node
-        elif node.bookID < y.bookID:  # Check if it is right Node or Left Node by checking the value
-            y.left = node
+        self.parents[slot] = y  # Set parent of Node as y
+        if y == self.NONE:
+            self.root = slot
+        elif bookID < keys[y]:  # Check if it is right Node or Left Node by checking the value
+            lefts[y] = slot
         else:
-            y.right = node
+            rights[y] = slot
 
-        if node.parent is None:  # Root node is always Black
-            node.color = 0
+        if y == self.NONE:  # Root node is always Black
+            self.colors[slot] = 0
             return
 
-        if node.parent.parent is None:  # If parent of node is Root Node
+        if self.parents[y] == self.NONE:  # If parent of node is Root Node
             return
 
-        self.fixInsert(node)  # Else call for Fix Up
+        self.fixInsert(slot)  # Else call for Fix Up
 
-    def borrowBook(self, patronID, bookID, patronPriority):
+    def closestBooks(self, targetID):
         """
-        Allow a patron to borrow a book that is available and update the status of the book.
+        Find the books with the closest IDs below and above the given ID, or the book with that ID.
+
+        Params:
+            - targetID (int): Target book ID
+
+        Returns:
+            tuple: (closestLower, match, closestHigher) slots, None where there is no such book
+        """
+        keys = self.keys
+        current = self.root
+        closestLower = None
+        closestHigher = None
+
+        # Traverse the tree to find the closest lower and higher book IDs
+        while current != self.TNULL:
+            if keys[current] < targetID:
+                closestLower = current
+                current = self.rights[current]
+            elif keys[current] > targetID:
+                closestHigher = current
+                current = self.lefts[current]
+            else:
+                # Exact match found
+                return closestLower, current, closestHigher
+        return closestLower, None, closestHigher
+
+
+class LeafBlock:
+
+    def __init__(self, keys, nodes):
+        """
+        Initialize a leaf block of a SortedBlockIndex.
+
+        Params:
+            - keys (list): sorted book IDs stored in the block
+            - nodes (list): book nodes, in the same order as the keys
+        """
+        self.keys = keys
+        self.nodes = nodes
+        self.next = None  # Following leaf block, in key order
+
+
+class SortedBlockIndex(NodeLibrary):
+    """
+    Index storing the books in a chain of sorted leaf blocks, the leaf level of a B+-tree.
+
+    The first key of every block is kept in a sorted list, so a key is located with two binary searches and a
+    range scan reads contiguous blocks by following the leaf chain. Borrowing, returning, reservations and
+    printing come from Library and the accessors from NodeLibrary, on the same Node records as RedBlackTree.
+    There are no colours, so ColorFlipCount always reports 0. With duplicate book IDs, lookups and deletions
+    resolve the first inserted of the duplicates, where RedBlackTree resolves the first one on its search path.
+    """
+
+    BLOCK_SIZE = 128  # A block is split in two when it grows beyond this many books
+
+    def __init__(self, cacheSize=0, cacheRangeBytes=1 << 20):
+        """Initialize an index without blocks
+
+        Params:
+            - cacheSize (int): size of the cache of rendered PrintBook/PrintBooks output, 0 disables it
+            - cacheRangeBytes (int): memory available to the cached PrintBooks results
+        """
+        super().__init__(cacheSize, cacheRangeBytes)
+        self.TNULL = None  # Handle returned by searchTreeHelper when the book is not found
+        self.root = None  # There is no tree, searchTreeHelper and deleteNodeHelper ignore the node they are given
+        self.blocks = []
+        self.blockMins = []  # First key of every block
+
+    def locate(self, bookID):
+        """
+        Find the position of the first book whose ID is not smaller than the given ID.
+
+        Params:
+            - bookID (int): ID of the book
+
+        Returns:
+            - i (int): index of the block, or -1 if the index is empty
+            - pos (int): position in the block, equal to the block size if all the IDs are smaller
+        """
+        if not self.blocks:
+            return -1, 0
+        i = max(bisect.bisect_left(self.blockMins, bookID) - 1, 0)
+        pos = bisect.bisect_left(self.blocks[i].keys, bookID)
+        if pos == len(self.blocks[i].keys) and i + 1 < len(self.blocks):
+            i, pos = i + 1, 0
+        return i, pos
+
+    def searchTreeHelper(self, node, bookID):
+        """
+        Search the index for a specific BookID.
+
+        Params:
+            - node (Node): unused, kept for compatibility with Library
+            - bookID (int): ID of the book
+
+        Returns:
+            Node that has the BookID, TNULL if there is none
+        """
+        i, pos = self.locate(bookID)
+        if i >= 0 and pos < len(self.blocks[i].keys) and self.blocks[i].keys[pos] == bookID:
+            return self.blocks[i].nodes[pos]
+        return self.TNULL
+
+    def insertNode(self, bookID, bookName, authorName, availabilityStatus):
+        """
+        Insert a book into its leaf block, splitting the block if it becomes too large.
 
         Params:
-            - patronID (int): ID of the patron
             - bookID (int): ID of the book
-            - patronPriority (int): Priority of the patron
+            - bookName (str): Name of the book
+            - authorName (str): Name of the author
+            - availability (str): Status of availability of the book
 
         Returns:
              None
         """
-        # Search for the book in the tree using its ID
-        node = self.searchTreeHelper(self.root, bookID)
-        if node != self.TNULL:
-            # If the book is found and is available for borrowing
-            if node.availability and (
-                node.borrowedBy is None or node.borrowedBy != patronID
-            ):  
-                node.availability = False  # Set the book as borrowed and update the borrower's ID
-                node.borrowedBy = patronID
-                print(f"Book {bookID} Borrowed by Patron {patronID}\n")
-            else:
-                # If the book is not available, add the patron's reservation
-                # The reservation is added to the book's min-heap based on priority
-                self.addReservation(bookID, patronID, patronPriority)
-                print(f"Book {bookID} Reserved by Patron {patronID}\n")
-        else:
-            # If the book is not found in the library
-            print(f"Book {bookID} not found in the library\n")
+        node = self.newNode(bookID, bookName, authorName, availabilityStatus)
+        if not self.blocks:
+            self.blocks.append(LeafBlock([bookID], [node]))
+            self.blockMins.append(bookID)
+            return
 
-    def returnBook(self, patronID, bookID):
+        i = max(bisect.bisect_right(self.blockMins, bookID) - 1, 0)
+        block = self.blocks[i]
+        pos = bisect.bisect_right(block.keys, bookID)
+        block.keys.insert(pos, bookID)
+        block.nodes.insert(pos, node)
+        self.blockMins[i] = block.keys[0]
+
+        if len(block.keys) > self.BLOCK_SIZE:
+            # Move the upper half into a new block chained after this one
+            half = len(block.keys) // 2
+            newBlock = LeafBlock(block.keys[half:], block.nodes[half:])
+            del block.keys[half:]
+            del block.nodes[half:]
+            newBlock.next = block.next
+            block.next = newBlock
+            self.blocks.insert(i + 1, newBlock)
+            self.blockMins.insert(i + 1, newBlock.keys[0])
+
+    def deleteNodeHelper(self, node, bookID):
         """
-        Allow a patron to return a borrowed book. Update the book's status and assign the book to the patron with
-        highest priority in the Reservation Heap.
+        Remove a book from its leaf block, merging blocks that become too small.
 
         Params:
-            - patronID (int): ID of the patron
-            - bookID (int): ID of thr book
+            - node (Node): unused, kept for compatibility with Library
+            - bookID (int): ID of a book
 
         Returns:
-            None
+             None
         """
-        node = self.searchTreeHelper(self.root, bookID)
-        if node != self.TNULL:
-            if node.borrowedBy == patronID:
-                node.availability = True
-                node.borrowedBy = None
-                print(f"Book {bookID} Returned by Patron {patronID}\n")
+        i, pos = self.locate(bookID)
+        if i < 0 or pos == len(self.blocks[i].keys) or self.blocks[i].keys[pos] != bookID:
+            print("Cannot find key in the tree")
+            return
 
-                # Check if there are reservations and assign to the next patron
-                if len(node.reservationHeap.heap) > 0:
-                    nextReservation = node.reservationHeap.extractMin()
-                    node.availability = False
-                    node.borrowedBy = nextReservation[0]
-                    print(f"Book {bookID} Allotted to Patron {nextReservation[0]}\n")
-                else:
-                    # print("No reservations for this book. It is now available for borrowing.")
-                    pass
-            else:
-                print(f"Patron {patronID} cannot return a book they haven't borrowed")
-        else:
-            print(f"Book {bookID} not found in the library\n")
+        block = self.blocks[i]
+        self.releaseNode(block.nodes[pos])
+        del block.keys[pos]
+        del block.nodes[pos]
+
+        if not block.keys:
+            # Unlink the empty block from the chain
+            if i > 0:
+                self.blocks[i - 1].next = block.next
+            del self.blocks[i]
+            del self.blockMins[i]
+            return
 
-    def deleteBook(self, bookID):
+        self.blockMins[i] = block.keys[0]
+        nextBlock = block.next
+        if (
+            len(block.keys) < self.BLOCK_SIZE // 4
+            and nextBlock is not None
+            and len(block.keys) + len(nextBlock.keys) <= self.BLOCK_SIZE
+        ):
+            # Absorb the following block so that range scans keep reading well filled blocks
+            block.keys.extend(nextBlock.keys)
+            block.nodes.extend(nextBlock.nodes)
+            block.next = nextBlock.next
+            del self.blocks[i + 1]
+            del self.blockMins[i + 1]
+
+    def scanBooks(self, bookID1, bookID2):
         """
-        Delete the book from the library and notify the patrons in the reservation list that the book is no longer
-        available to borrow.
+        Print the details of the books in the given range, scanning the leaf chain.
 
         Params:
-            - bookID (int): ID of the book
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
 
         Returns:
-            None
+             None
         """
-        node = self.searchTreeHelper(self.root, bookID)  # Search for the node (book) in the tree by its book ID
-        if node != self.TNULL:
-            # If the book is found, process the reservation list
-            patronList = []
-            # Extract and collect patrons from the book's reservation heap
-            while len(node.reservationHeap.heap) > 0:
-                nextReservation = node.reservationHeap.extractMin()
-                patronList.append(str(nextReservation[0]))
-            # Notify the patrons that the book is no longer available
-            if len(patronList) == 0:
-                print(f"Book {bookID} is no longer available\n")
-            else:
-                if len(patronList) == 1:
-                    print(
-                        f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(patronList)} "
-                        f"has been cancelled!\n"
-                    )
-                else:
-                    print(
-                        f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(patronList)} "
-                        f"have been cancelled!\n"
-                    )
-            # Delete the book from the tree
-            self.deleteNodeHelper(self.root, bookID)
-        else:
-            # Handle the case where the bookID is not found in the library
-            print(f"Book {bookID} not found in the library\n")
+        i, pos = self.locate(bookID1)
+        block = self.blocks[i] if i >= 0 else None
+        while block is not None:
+            end = bisect.bisect_right(block.keys, bookID2)
+            for node in block.nodes[pos:end]:
+                self.printBookDetails(node)
+            if end < len(block.keys):
+                break
+            block = block.next
+            pos = 0
 
-    def findClosestBook(self, targetID):
+    def iterBooks(self, bookID1, bookID2):
         """
-        Find the book with an ID closest to the given ID. Print all the details about the book.
+        Iterate over the books in the given range in order, following the leaf chain.
 
         Params:
-            - targetID (int): Target book ID
+            - bookID1 (int): initial BookID
+            - bookID2 (int): end BookID
 
         Returns:
-            None
+            A generator of the nodes in the range
         """
-        current = self.root
-        closestLower = None
-        closestHigher = None
-
-        # Traverse the tree to find the closest lower and higher book IDs
-        while current != self.TNULL:
-            if current.bookID < targetID:
-                closestLower = current
-                current = current.right
-            elif current.bookID > targetID:
-                closestHigher = current
-                current = current.left
-            else:
-                # Exact match found
-                self.printBookDetails(current)
+        i, pos = self.locate(bookID1)
+        block = self.blocks[i] if i >= 0 else None
+        while block is not None:
+            end = bisect.bisect_right(block.keys, bookID2)
+            yield from block.nodes[pos:end]
+            if end < len(block.keys):
                 return
+            block = block.next
+            pos = 0
 
-        # Determine the closest book(s) and print details
-        if closestLower and closestHigher:
-            diffLower = targetID - closestLower.bookID
-            diffHigher = closestHigher.bookID - targetID
-            if diffLower < diffHigher:
-                self.printBookDetails(closestLower)
-            elif diffHigher < diffLower:
-                self.printBookDetails(closestHigher)
-            else:
-                # In case of a tie, print both, ordered by book IDs
-                books = [closestLower, closestHigher]
-                books.sort(key=lambda x: x.bookID)
-                for book in books:
-                    self.printBookDetails(book)
-        elif closestLower:
-            self.printBookDetails(closestLower)
-        elif closestHigher:
-            self.printBookDetails(closestHigher)
-        else:
-            print("No closest book found")
-
-    def colorFlipCount(self):
+    def resolveMany(self, sortedIDs):
         """
-        Tracks the occurrence of color changes in the tree nodes during the operations.
+        Find the nodes of many books by merging the sorted IDs with the sorted keys of the leaf blocks.
+
+        Params:
+            - sortedIDs (list): sorted, distinct book IDs
 
         Returns:
-            None
+            dict mapping each found bookID to its node
         """
-        print(f"Colour Flip Count: {self.colorFlips}\n")
-
-    @staticmethod
-    def sortReservations(node):
+        found = {}
+        block = None
+        pos = 0
+        for bookID in sortedIDs:
+            if block is None or bookID > block.keys[-1]:
+                # Jump to the block holding the ID instead of walking the chain over a gap
+                i, pos = self.locate(bookID)
+                if i < 0:
+                    break
+                block = self.blocks[i]
+            pos = bisect.bisect_left(block.keys, bookID, pos)
+            if pos < len(block.keys) and block.keys[pos] == bookID:
+                found[bookID] = block.nodes[pos]
+        return found
+
+    def closestBooks(self, targetID):
         """
-        Sort the reservations by Priority and timestamp.
+        Find the books with the closest IDs below and above the given ID, or the book with that ID.
 
         Params:
-            - node (Node): a node
+            - targetID (int): Target book ID
 
         Returns:
-            None
+            tuple: (closestLower, match, closestHigher) nodes, None where there is no such book
         """
-        return sorted(node.reservationHeap.heap, key=lambda x: (x[1], x[2]))
+        i, pos = self.locate(targetID)
+        if i < 0:
+            return None, None, None
+
+        block = self.blocks[i]
+        closestHigher = block.nodes[pos] if pos < len(block.keys) else None
+        if closestHigher is not None and closestHigher.bookID == targetID:
+            # Exact match found
+            return None, closestHigher, None
+        if pos > 0:
+            closestLower = block.nodes[pos - 1]
+        else:
+            closestLower = self.blocks[i - 1].nodes[-1] if i > 0 else None
+        return closestLower, None, closestHigher
 
-    def printBookDetails(self, node):
-        """
-        Print details of a Book
 
-        Params:
-            - node (Node): a node
+# Tree backends selectable for main, by name
+BACKENDS = {
+    "rbtree": RedBlackTree,
+    "array": ArrayRedBlackTree,
+    "blocks": SortedBlockIndex,
+}
 
-        Returns:
-            None
-        """
-        print(f"BookID = {node.bookID}")
-        print(f'Title = "{node.bookName}"')
-        print(f'Author = "{node.authorName}"')
-        print(f"Availability = \"{'Yes' if node.availability == 'Yes' else 'No'}\"")
-        print(
-            f"BorrowedBy = {node.borrowedBy if node.borrowedBy is not None else 'None'}"
-        )
-        print(f"Reservations = {[res[0] for res in self.sortReservations(node)]}\n")
+
+# Formats of Export, and the fields of the exported records
+EXPORT_FORMATS = ("jsonl", "csv", "columns")
+EXPORT_FIELDS = ("bookID", "title", "author", "availability", "borrowedBy", "reservations")
+encodeJsonString = json.encoder.encode_basestring_ascii
+
+
+def formatJsonRecord(record):
+    """
+    Format an exported record as a JSON object, like json.dumps would but without building a dict first.
+
+    Params:
+    - record (tuple): record returned by bookRecord
+
+    Returns:
+        str: the JSON line
+    """
+    bookID, bookName, authorName, availability, borrowedBy, reservations = record
+    return (
+        f'{{"bookID": {bookID}, "title": {encodeJsonString(bookName)}, "author": {encodeJsonString(authorName)}, '
+        f'"availability": "{availability}", "borrowedBy": {"null" if borrowedBy is None else borrowedBy}, '
+        f'"reservations": [{", ".join(map(str, reservations))}]}}\n'
+    )
+
+
+def exportBooks(library, outputFile, exportFormat, bookID1, bookID2, chunkSize=1000):
+    """
+    Stream the catalog and circulation state of the books in the given range to a file, in bookID order.
+
+    Records are read from an in-order traversal and written in chunks, so the memory used does not depend on the
+    size of the catalog. Formats:
+        - jsonl: one JSON object per book
+        - csv: a header and one row per book, with the reservations separated by spaces
+        - columns: one JSON object per chunk, mapping every field to the column of its values
+
+    Params:
+    - library (Library): library to export
+    - outputFile: text file to write to
+    - exportFormat (str): one of EXPORT_FORMATS
+    - bookID1 (int): initial BookID
+    - bookID2 (int): end BookID
+    - chunkSize (int): number of records written at a time
+
+    Returns:
+        int: number of exported books
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if exportFormat not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {exportFormat}")
+
+    csvWriter = None
+    if exportFormat == "csv":
+        csvWriter = csv.writer(outputFile, lineterminator="\n")
+        csvWriter.writerow(EXPORT_FIELDS)
+
+    count = 0
+    chunk = []
+    records = library.iterRecords(bookID1, bookID2)
+    while True:
+        chunk.clear()
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunkSize:
+                break
+        if not chunk:
+            return count
+        count += len(chunk)
+
+        if exportFormat == "jsonl":
+            outputFile.write("".join(map(formatJsonRecord, chunk)))
+        elif exportFormat == "csv":
+            csvWriter.writerows(
+                record[:5] + (" ".join(map(str, record[5])) if record[5] else "",) for record in chunk
+            )
+        else:
+            columns = dict(zip(EXPORT_FIELDS, map(list, zip(*chunk))))
+            outputFile.write(json.dumps(columns) + "\n")
 
 
 def readInputFile(inputFile):
@@ -822,72 +3032,558 @@ def parseLine(line):
         raise ValueError("Line format is incorrect")
 
 
-def main(inputFile):
-    # Create object of Red-Black Tree class
-    bst = RedBlackTree()
+# Argument types of every command accepted by main; a command's arguments are converted once while parsing
+COMMAND_ARG_TYPES = {
+    "InsertBook": (int, str, str, str),
+    "PrintBook": (int,),
+    "PrintBooks": (int, int),
+    "BorrowBook": (int, int, int),
+    "ReturnBook": (int, int),
+    "DeleteBook": (int,),
+    "FindClosestBook": (int,),
+    "ColorFlipCount": (),
+    "Quit": (),
+    "Export": (str, int, int),
+}
+
+# Method name of the record that carries a parse error to the executor. It cannot match the \w+ method names
+# of parseLine, so no input line can produce a record with this name
+PARSE_ERROR = "<ParseError>"
+
+
+def parseCommand(line):
+    """
+    Parse an input file line into a compact pre-typed command record.
+
+    Params:
+    - line (str): single line of the input file
+
+    Returns:
+        A tuple (methodName, arg1, arg2, ...) with the arguments already converted to their types
+
+    Raises:
+        ValueError: If the line format is incorrect or an argument cannot be converted
+        IndexError: If the line has fewer arguments than the command needs
+    """
+    methodName, argsList = parseLine(line)
+    argTypes = COMMAND_ARG_TYPES.get(methodName)
+    if argTypes is None:
+        # Unknown commands are kept so that the executor can ignore them in order
+        return (methodName,)
+    return (methodName,) + tuple(argType(argsList[i]) for i, argType in enumerate(argTypes))
+
+
+def parseChunk(lines):
+    """
+    Parse a chunk of input file lines into command records. Runs inside worker processes.
+
+    A line that fails to parse ends the chunk with an error record, so that the error is raised only
+    after every preceding command has been executed, exactly like the sequential mode.
+
+    Params:
+    - lines (list): lines of the input file
+
+    Returns:
+        A list of command records
+    """
+    records = []
+    for line in lines:
+        try:
+            records.append(parseCommand(line))
+        except (ValueError, IndexError) as error:
+            records.append((PARSE_ERROR, error))
+            break
+    return records
+
+
+def parseCommandsParallel(fileContents, workers, chunkSize):
+    """
+    Parse the input file lines in a process pool and yield the command records in their original order.
+
+    Params:
+    - fileContents (list): lines of the input file
+    - workers (int): number of worker processes
+    - chunkSize (int): number of lines parsed by a worker per task
+
+    Returns:
+        A generator of command records
+    """
+    chunks = (fileContents[i:i + chunkSize] for i in range(0, len(fileContents), chunkSize))
+    with multiprocessing.Pool(workers) as pool:
+        # imap keeps the chunks in submission order while later chunks are still being parsed
+        for records in pool.imap(parseChunk, chunks):
+            yield from records
+
+
+# Binary command log: a magic header followed by one record per command. A record is a fixed-width one byte
+# opcode and its arguments, with integers as zigzag varints and strings interned in a table built while reading
+BINARY_MAGIC = b"GLB1"
+BINARY_BUFFER_SIZE = 1 << 16  # Bytes of a binary command log read at a time
+
+# Opcodes of the GLB1 format. Logs are archived, so an opcode must never be renumbered or reused: a new command
+# gets the next free opcode, whatever its position in COMMAND_ARG_TYPES
+BINARY_OPCODES = {
+    "InsertBook": 1,
+    "PrintBook": 2,
+    "PrintBooks": 3,
+    "BorrowBook": 4,
+    "ReturnBook": 5,
+    "DeleteBook": 6,
+    "FindClosestBook": 7,
+    "ColorFlipCount": 8,
+    "Quit": 9,
+    "Export": 10,
+    PARSE_ERROR: 0xFF,
+}
+BINARY_METHOD_NAMES = {opcode: methodName for methodName, opcode in BINARY_OPCODES.items()}
+PARSE_ERROR_TYPES = {"ValueError": ValueError, "IndexError": IndexError}
+
+
+def writeVarint(buffer, value):
+    """
+    Append a signed integer to the buffer as a zigzag encoded varint.
+
+    Params:
+    - buffer (bytearray): output buffer
+    - value (int): integer to encode
+
+    Returns:
+        None
+    """
+    # Zigzag encoding maps 0, -1, 1, -2, ... to 0, 1, 2, 3, ... so that small negative numbers stay short
+    value = value << 1 if value >= 0 else (-value << 1) - 1
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def readVarint(data, pos):
+    """
+    Read a zigzag encoded varint from the data.
+
+    Params:
+    - data (bytes): encoded data
+    - pos (int): position of the varint
+
+    Returns:
+        - value (int): decoded integer
+        - pos (int): position after the varint
+
+    Raises:
+        IndexError: If the data ends inside the varint
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def writeString(buffer, string, stringTable):
+    """
+    Append a string to the buffer. A string that was written before is encoded only by its index in the table.
+    A new string is encoded by the next free index followed by its UTF-8 length and bytes.
+
+    Params:
+    - buffer (bytearray): output buffer
+    - string (str): string to encode
+    - stringTable (dict): index of every string written so far
+
+    Returns:
+        None
+    """
+    index = stringTable.get(string)
+    if index is not None:
+        writeVarint(buffer, index)
+        return
+    index = len(stringTable)
+    stringTable[string] = index
+    encoded = string.encode("utf-8")
+    writeVarint(buffer, index)
+    writeVarint(buffer, len(encoded))
+    buffer += encoded
+
+
+def readString(data, pos, stringTable):
+    """
+    Read a string written by writeString.
+
+    Params:
+    - data (bytes): encoded data
+    - pos (int): position of the string
+    - stringTable (list): strings read so far, in table order
+
+    Returns:
+        - string (str): decoded string
+        - pos (int): position after the string
+
+    Raises:
+        IndexError: If the data ends inside the string
+        ValueError: If the string refers to a string that is not in the table or has a negative length
+    """
+    start = pos
+    index, pos = readVarint(data, pos)
+    if 0 <= index < len(stringTable):
+        return stringTable[index], pos
+    if index != len(stringTable):
+        raise ValueError(f"Unknown string index {index} at offset {start}")
+    length, pos = readVarint(data, pos)
+    if length < 0:
+        raise ValueError(f"Negative string length at offset {start}")
+    if pos + length > len(data):
+        raise IndexError(f"Truncated string at offset {start}")
+    string = data[pos:pos + length].decode("utf-8")
+    stringTable.append(string)
+    return string, pos + length
+
+
+def convertToBinary(inputFile, outputFile):
+    """
+    Convert a text input file into a binary command log that main can execute without parsing.
+
+    Commands unknown to main are dropped as main ignores them anyway. A line that fails to parse is stored
+    as an error record and raised when the log is executed, at the same point as in the text file.
+
+    Params:
+    - inputFile (str): text input file name
+    - outputFile (str): binary command log file name
 
-    # Read the input file
+    Returns:
+        None
+    """
     fileContents = readInputFile(inputFile)
+    buffer = bytearray(BINARY_MAGIC)
+    stringTable = {}
+    for command in parseChunk(fileContents):
+        methodName = command[0]
+        if methodName == PARSE_ERROR:
+            error = command[1]
+            buffer.append(BINARY_OPCODES[PARSE_ERROR])
+            writeString(buffer, type(error).__name__, stringTable)
+            writeString(buffer, str(error), stringTable)
+            continue
+        if methodName not in BINARY_OPCODES:
+            continue
+        buffer.append(BINARY_OPCODES[methodName])
+        for argType, arg in zip(COMMAND_ARG_TYPES[methodName], command[1:]):
+            if argType is int:
+                writeVarint(buffer, arg)
+            else:
+                writeString(buffer, arg, stringTable)
+    with open(outputFile, "wb") as file:
+        file.write(buffer)
+
+
+def isBinaryCommandLog(inputFile):
+    """
+    Check whether a file is a binary command log.
+
+    Params:
+    - inputFile (str): input file name
+
+    Returns:
+        True if the file starts with the binary command log header
+    """
+    try:
+        with open(inputFile, "rb") as file:
+            return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def readBinaryCommands(inputFile, bufferSize=BINARY_BUFFER_SIZE):
+    """
+    Read the command records of a binary command log.
+
+    The log is read and decoded one buffer at a time, so the memory used does not depend on the size of the log.
+    A record that continues past the end of the buffer is decoded again once the next buffer is appended.
+
+    Params:
+    - inputFile (str): binary command log file name
+    - bufferSize (int): number of bytes read from the file at a time
+
+    Returns:
+        A generator of command records, the same records parseCommand creates
+
+    Raises:
+        ValueError: If the file contains an unknown opcode or is truncated or corrupt
+    """
+    stringTable = []
+    # Arguments of every opcode, True for an integer and False for a string
+    layouts = {
+        opcode: (methodName, tuple(argType is int for argType in COMMAND_ARG_TYPES[methodName]))
+        for opcode, methodName in BINARY_METHOD_NAMES.items() if methodName != PARSE_ERROR
+    }
+    with open(inputFile, "rb") as file:
+        file.read(len(BINARY_MAGIC))
+        offset = len(BINARY_MAGIC)  # Position of data in the file
+        data = file.read(bufferSize)
+        pos = 0
+        while True:
+            if pos >= len(data):
+                offset += len(data)
+                data = file.read(bufferSize)
+                pos = 0
+                if not data:
+                    return
+            start = pos
+            layout = layouts.get(data[pos])
+            methodName = layout[0] if layout is not None else BINARY_METHOD_NAMES.get(data[pos])
+            if methodName is None:
+                raise ValueError(f"Unknown opcode {data[pos]} at offset {offset + pos}")
+            pos += 1
+            tableSize = len(stringTable)
+            try:
+                if layout is None:
+                    errorType, pos = readString(data, pos, stringTable)
+                    message, pos = readString(data, pos, stringTable)
+                    yield PARSE_ERROR, PARSE_ERROR_TYPES.get(errorType, ValueError)(message)
+                    continue
+                command = [methodName]
+                for isInt in layout[1]:
+                    # Every argument starts with a varint, decoded inline as readVarint would: this loop runs for
+                    # every argument of the log and a function call per argument would dominate the decoding
+                    argStart = pos
+                    byte = data[pos]
+                    pos += 1
+                    value = byte
+                    if byte >= 0x80:
+                        value &= 0x7F
+                        shift = 7
+                        while True:
+                            byte = data[pos]
+                            pos += 1
+                            value |= (byte & 0x7F) << shift
+                            if byte < 0x80:
+                                break
+                            shift += 7
+                    value = (value >> 1) ^ -(value & 1)
+                    if isInt:
+                        command.append(value)
+                    elif 0 <= value < len(stringTable):
+                        # A string that was written before, the varint is its index in the table
+                        command.append(stringTable[value])
+                    else:
+                        arg, pos = readString(data, argStart, stringTable)
+                        command.append(arg)
+            except IndexError:
+                # The record continues past the buffer: decode it again with the next buffer appended
+                more = file.read(bufferSize)
+                if not more:
+                    raise ValueError(f"Truncated {methodName} record at offset {offset + start}") from None
+                del stringTable[tableSize:]
+                data = data[start:] + more
+                offset += start
+                pos = 0
+                continue
+            except ValueError as error:
+                raise ValueError(f"Corrupt {methodName} record at offset {offset + start}: {error}") from None
+            yield tuple(command)
+
+
+def executeCommand(bst, command):
+    """
+    Apply a single command record to the library.
+
+    Params:
+    - bst (Library): the library
+    - command (tuple): command record created by parseCommand
+
+    Returns:
+        False if the command terminates the program, True otherwise
+
+    Raises:
+        ValueError, IndexError: If the record carries a parse error
+    """
+    methodName = command[0]
+
+    # Check the method and process
+    if methodName == "InsertBook":
+        bst.insertBook(command[1], command[2], command[3], command[4])
+    elif methodName == "PrintBook":
+        bst.printBook(command[1])
+    elif methodName == "PrintBooks":
+        bst.printBooks(command[1], command[2])
+    elif methodName == "BorrowBook":
+        bst.borrowBook(command[1], command[2], command[3])
+    elif methodName == "ReturnBook":
+        bst.returnBook(command[1], command[2])
+    elif methodName == "DeleteBook":
+        bst.deleteBook(command[1])
+    elif methodName == "FindClosestBook":
+        bst.findClosestBook(command[1])
+    elif methodName == "ColorFlipCount":
+        bst.colorFlipCount()
+    elif methodName == "Export":
+        if command[1] in EXPORT_FORMATS:
+            exportBooks(bst, sys.stdout, command[1], command[2], command[3])
+        else:
+            print(f"Unknown export format {command[1]}\n")
+    elif methodName == "Quit":
+        print("Program Terminated!!")
+        return False
+    elif methodName == PARSE_ERROR:
+        raise command[1]
+    return True
+
+
+def main(
+    inputFile, workers=1, chunkSize=1000, backend="rbtree", cacheSize=0, holdExpiry=None, loanExpiry=None,
+    clock="wall", metadataBudget=None, metadataFile="", cacheRangeBytes=1 << 20,
+):
+    """
+    Execute all the commands of the input file and write their output to <inputFile>_output_file.txt.
+
+    Params:
+    - inputFile (str): input file name, either a text input file or a binary command log
+    - workers (int): number of processes parsing the input file; 1 parses it in this process
+    - chunkSize (int): number of lines handed to a worker process at a time
+    - backend (str): name of the tree backend in BACKENDS
+    - cacheSize (int): size of the cache of rendered PrintBook/PrintBooks output, 0 disables it
+    - holdExpiry (float): time after which a reservation expires, None for never
+    - loanExpiry (float): time after which a borrowed book is returned, None for never
+    - clock (str): "wall" measures time in seconds, "command" in executed commands for deterministic replay
+    - metadataBudget (int): bytes of titles and authors kept in memory, the rest is kept on disk; None keeps
+      all of them in memory
+    - metadataFile (str): new database file of the titles and authors on disk, deleted at exit; "" for a
+      temporary file
+    - cacheRangeBytes (int): memory available to the cached PrintBooks results
+
+    Returns:
+        None
+    """
+    # Create object of the selected Red-Black Tree class
+    bst = BACKENDS[backend](cacheSize, cacheRangeBytes)
+
+    commandClock = CommandClock() if clock == "command" else None
+    if commandClock is not None:
+        bst.clock = commandClock
+    scheduler = None
+    if holdExpiry is not None or loanExpiry is not None:
+        scheduler = ExpiryScheduler(bst, holdExpiry, loanExpiry)
+    metadataStore = None
+    if metadataBudget is not None:
+        metadataStore = MetadataStore(bst, metadataBudget, metadataFile)
+
+    if isBinaryCommandLog(inputFile):
+        # Binary command logs hold ready-made command records and need no parsing
+        commands = readBinaryCommands(inputFile)
+        workers = 1
+    else:
+        # Read the input file
+        fileContents = readInputFile(inputFile)
+
+        if workers > 1:
+            commands = parseCommandsParallel(fileContents, workers, chunkSize)
+        else:
+            commands = (parseCommand(operation) for operation in fileContents)
 
     # Open the output file in append mode
-    outputFileName = inputFileName.split(".")[0] + "_output_file.txt"
+    outputFileName = inputFile.split(".")[0] + "_output_file.txt"
     with open(outputFileName, "w") as outputFile:
         # Redirect standard output to the output file
         sys.stdout = outputFile
+        try:
+            # Apply the commands sequentially in their original order
+            for command in commands:
+                if scheduler is not None:
+                    scheduler.expireDue()
+                if not executeCommand(bst, command):
+                    break
+                if commandClock is not None:
+                    commandClock.tick()
+        finally:
+            # Reset standard output to original
+            sys.stdout = sys.__stdout__
+            if workers > 1:
+                # Shut the pool down even if Quit stopped the execution early
+                commands.close()
+            if metadataStore is not None:
+                metadataStore.close()
+
+
+def parseArguments(argv):
+    """
+    Parse the command-line arguments.
 
-        # Iterate over the input file content
-        for operation in fileContents:
-            # Separate method and arguments
-            methodName, argsList = parseLine(operation)
-
-            # Check the method and process
-            if methodName == "InsertBook":
-                bookID, bookName, authorName, availabilityStatus = (
-                    int(argsList[0]),
-                    argsList[1],
-                    argsList[2],
-                    argsList[3],
-                )
-                bst.insertBook(bookID, bookName, authorName, availabilityStatus)
-            elif methodName == "PrintBook":
-                bookID = int(argsList[0])
-                bst.printBook(bookID)
-            elif methodName == "PrintBooks":
-                bookID1, bookID2 = int(argsList[0]), int(argsList[1])
-                bst.printBooks(bookID1, bookID2)
-            elif methodName == "BorrowBook":
-                patronID, bookID, patronPriority = (
-                    int(argsList[0]),
-                    int(argsList[1]),
-                    int(argsList[2]),
-                )
-                bst.borrowBook(patronID, bookID, patronPriority)
-            elif methodName == "ReturnBook":
-                patronID, bookID = int(argsList[0]), int(argsList[1])
-                bst.returnBook(patronID, bookID)
-            elif methodName == "DeleteBook":
-                bookID = int(argsList[0])
-                bst.deleteBook(bookID)
-            elif methodName == "FindClosestBook":
-                targetID = int(argsList[0])
-                bst.findClosestBook(targetID)
-            elif methodName == "ColorFlipCount":
-                bst.colorFlipCount()
-            elif methodName == "Quit":
-                print("Program Terminated!!")
-                break
+    Params:
+    - argv (list): command-line arguments without the program name
 
-        # Reset standard output to original
-        sys.stdout = sys.__stdout__
+    Returns:
+        argparse.Namespace with the parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="gatorLibrary.py")
+    parser.add_argument("inputFileName", help="file with the commands to execute")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes parsing the input file (default: 1, parse in this process)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=1000,
+        help="number of lines handed to a parsing process at a time (default: 1000)",
+    )
+    parser.add_argument(
+        "--backend", choices=sorted(BACKENDS), default="rbtree",
+        help="tree implementation storing the books (default: rbtree)",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=0,
+        help="number of rendered PrintBook records and PrintBooks results kept in an LRU cache (default: 0, off)",
+    )
+    parser.add_argument(
+        "--cache-range-bytes", type=int, default=1 << 20, metavar="BYTES",
+        help="memory available to the cached PrintBooks results; larger results are not cached (default: 1 MiB)",
+    )
+    parser.add_argument(
+        "--hold-expiry", type=float,
+        help="time after which a reservation expires (default: never)",
+    )
+    parser.add_argument(
+        "--loan-expiry", type=float,
+        help="time after which a borrowed book is returned and allotted to the next reservation (default: never)",
+    )
+    parser.add_argument(
+        "--clock", choices=["wall", "command"], default="wall",
+        help="unit of the expiry times: seconds of wall time, or executed commands for deterministic replay "
+             "(default: wall)",
+    )
+    parser.add_argument(
+        "--metadata-budget", type=int, metavar="BYTES",
+        help="keep book titles and authors on disk with at most BYTES of them in memory (default: all in memory)",
+    )
+    parser.add_argument(
+        "--metadata-file", default="",
+        help="new database file for the titles and authors kept on disk, deleted at exit; an existing file is "
+             "refused (default: a temporary file)",
+    )
+    parser.add_argument(
+        "--convert-to", metavar="BINARYFILE",
+        help="convert the input file into a binary command log instead of executing it",
+    )
+    arguments = parser.parse_args(argv)
+    if arguments.metadata_budget is not None and arguments.cache_size > 0:
+        parser.error("--cache-size keeps rendered titles and authors in memory outside of --metadata-budget")
+    if arguments.metadata_file and os.path.exists(arguments.metadata_file) and os.path.getsize(arguments.metadata_file):
+        parser.error(f"--metadata-file must be a new file: {arguments.metadata_file} already exists")
+    return arguments
 
 
 if __name__ == "__main__":
-    # Get input file name from command-line argument
-    if len(sys.argv) != 2:
-        print("Usage: python app.py inputFileName")
-        sys.exit(1)
-
-    inputFileName = sys.argv[1]
+    # Get input file name and options from command-line arguments
+    arguments = parseArguments(sys.argv[1:])
 
-    # Call the main function with the input file
-    main(inputFileName)
+    if arguments.convert_to:
+        convertToBinary(arguments.inputFileName, arguments.convert_to)
+    else:
+        # Call the main function with the input file
+        main(
+            arguments.inputFileName, arguments.workers, arguments.chunk_size, arguments.backend,
+            arguments.cache_size, arguments.hold_expiry, arguments.loan_expiry, arguments.clock,
+            arguments.metadata_budget, arguments.metadata_file, arguments.cache_range_bytes,
+        )
@@ -0,0 +1,677 @@
+import io
+import array
+import random
+import csv
+import json
+import asyncio
+import threading
+import os
+import sys
+import shutil
+import contextlib
+import sqlite3
+
+import pytest
+
+import gatorLibrary
+
+
+def runCommands(library, lines):
+    """
+    Parse and execute input file lines against a library.
+
+    Params:
+    - library (RedBlackTree): the library
+    - lines (list): lines of an input file
+
+    Returns:
+        str: everything the commands printed
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for line in lines:
+            if not gatorLibrary.executeCommand(library, gatorLibrary.parseCommand(line)):
+                break
+    return output.getvalue()
+
+
+def testParseErrorCommandIsIgnoredLikeOtherUnknownCommands():
+    lines = ['InsertBook(1, "Title", "Author", "Yes")', "ParseError()", "PrintBook(1)", "Quit()"]
+    assert gatorLibrary.parseCommand("ParseError()") == ("ParseError",)
+    output = runCommands(gatorLibrary.RedBlackTree(), lines)
+    assert output.startswith("BookID = 1\n")
+    assert output.endswith("Program Terminated!!\n")
+
+
+def testParseErrorIsRaisedAfterThePrecedingCommands():
+    records = gatorLibrary.parseChunk(['InsertBook(1, "Title", "Author", "Yes")', "PrintBook(x)", "PrintBook(1)"])
+    assert len(records) == 2
+    library = gatorLibrary.RedBlackTree()
+    assert gatorLibrary.executeCommand(library, records[0])
+    with pytest.raises(ValueError):
+        gatorLibrary.executeCommand(library, records[1])
+
+
+def convertLines(tmp_path, lines):
+    """
+    Write input file lines to a text file and convert it into a binary command log.
+
+    Params:
+    - tmp_path (pathlib.Path): directory of the files
+    - lines (list): lines of an input file
+
+    Returns:
+        pathlib.Path: the binary command log
+    """
+    textFile = tmp_path / "commands.txt"
+    binaryFile = tmp_path / "commands.bin"
+    textFile.write_text("\n".join(lines) + "\n")
+    gatorLibrary.convertToBinary(str(textFile), str(binaryFile))
+    return binaryFile
+
+
+def testBinaryLogRoundTrip(tmp_path):
+    lines = [
+        'InsertBook(7, "Título", "Author", "Yes")',
+        'InsertBook(300000, "Other", "Author", "No")',
+        "PrintBooks(-5, 70000000000)",
+        "BorrowBook(12, 7, 3)",
+        "ReturnBook(12, 7)",
+        "DeleteBook(300000)",
+        "FindClosestBook(-1)",
+        "ColorFlipCount()",
+        "Export(csv, 0, 10)",
+        "Quit()",
+    ]
+    binaryFile = convertLines(tmp_path, lines)
+    assert gatorLibrary.isBinaryCommandLog(str(binaryFile))
+    assert list(gatorLibrary.readBinaryCommands(str(binaryFile))) == [gatorLibrary.parseCommand(line) for line in lines]
+
+
+def testBinaryLogKeepsParseErrorsAndDropsUnknownCommands(tmp_path):
+    lines = ['InsertBook(1, "Title", "Author", "Yes")', "ParseError()", "PrintBook(x)", "PrintBook(1)"]
+    records = list(gatorLibrary.readBinaryCommands(str(convertLines(tmp_path, lines))))
+    assert records[0] == gatorLibrary.parseCommand(lines[0])
+    assert records[1][0] == gatorLibrary.PARSE_ERROR
+    assert isinstance(records[1][1], ValueError)
+    assert len(records) == 2
+
+
+def testBinaryLogFormatIsFrozen(tmp_path):
+    # Archived logs must keep decoding to the same commands, whatever the order of COMMAND_ARG_TYPES
+    binaryFile = convertLines(tmp_path, ['InsertBook(1, "T", "A", "Yes")', "PrintBook(-1)", "Export(csv, 1, 2)", "Quit()"])
+    assert binaryFile.read_bytes() == (
+        b"GLB1" + b"\x01\x02\x00\x02T\x02\x02A\x04\x06Yes" + b"\x02\x01" + b"\x0a\x06\x06csv\x02\x04" + b"\x09"
+    )
+
+
+def testBinaryLogDecodesRecordsSplitAcrossBuffers(tmp_path):
+    lines = []
+    for bookID in range(0, 3000, 7):
+        lines += [
+            f'InsertBook({bookID * 99991}, "Title {bookID} {"x" * (bookID % 50)}", "Author {bookID % 9}", "Yes")',
+            f"BorrowBook({bookID}, {bookID * 99991}, {bookID % 4})",
+            f"PrintBooks({-bookID}, {bookID << 40})",
+        ]
+    lines.append("PrintBook(x)")
+    binaryFile = convertLines(tmp_path, lines)
+    expected = [gatorLibrary.parseCommand(line) for line in lines[:-1]]
+    for bufferSize in (1, 2, 3, 5, 8, 100, 4099, gatorLibrary.BINARY_BUFFER_SIZE):
+        records = list(gatorLibrary.readBinaryCommands(str(binaryFile), bufferSize))
+        assert records[:-1] == expected
+        assert records[-1][0] == gatorLibrary.PARSE_ERROR
+        assert str(records[-1][1]) == "invalid literal for int() with base 10: 'x'"
+
+
+@pytest.mark.parametrize("bufferSize", [1, 4, gatorLibrary.BINARY_BUFFER_SIZE])
+@pytest.mark.parametrize("cut", [1, 3, 6])
+def testTruncatedBinaryLogRaisesValueErrorWithOffset(tmp_path, cut, bufferSize):
+    binaryFile = convertLines(tmp_path, ["PrintBook(1)", 'InsertBook(300000, "Title", "Author", "Yes")'])
+    data = binaryFile.read_bytes()
+    binaryFile.write_bytes(data[:-cut])
+    records = gatorLibrary.readBinaryCommands(str(binaryFile), bufferSize)
+    assert next(records) == ("PrintBook", 1)
+    with pytest.raises(ValueError, match="offset 6"):
+        next(records)
+
+
+@pytest.mark.parametrize("bufferSize", [1, 3, gatorLibrary.BINARY_BUFFER_SIZE])
+def testUnknownOpcodeRaisesValueErrorWithOffset(tmp_path, bufferSize):
+    binaryFile = tmp_path / "commands.bin"
+    binaryFile.write_bytes(gatorLibrary.BINARY_MAGIC + b"\x09\x7f")
+    with pytest.raises(ValueError, match="offset 5"):
+        list(gatorLibrary.readBinaryCommands(str(binaryFile), bufferSize))
+
+
+def replay(library, lines, clock=None, scheduler=None):
+    """
+    Execute input file lines like main does, expiring holds and loans before every command.
+
+    Params:
+    - library (Library): the library
+    - lines (list): lines of an input file
+    - clock (CommandClock): clock of the library, ticked after every command
+    - scheduler (ExpiryScheduler): expiry of the library
+
+    Returns:
+        str: everything the commands printed
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for line in lines:
+            if scheduler is not None:
+                scheduler.expireDue()
+            if not gatorLibrary.executeCommand(library, gatorLibrary.parseCommand(line)):
+                break
+            if clock is not None:
+                clock.tick()
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testCirculationChangesInvalidateCachedOutput(backend):
+    lines = [f'InsertBook({bookID}, "Title{bookID}", "Author", "Yes")' for bookID in range(1, 6)]
+    views = ["PrintBook(3)", "PrintBooks(1, 5)", "PrintBooks(3, 3)", "PrintBook(3)", "PrintBooks(1, 5)"]
+    lines += views
+    for change in [
+        "BorrowBook(10, 3, 1)",  # Borrowed
+        "BorrowBook(12, 3, 1)",  # Reserved, the hold expires before the book is returned
+        "BorrowBook(11, 3, 2)",  # Reserved
+        "ReturnBook(10, 3)",  # Returned and allotted to patron 11
+    ] + ["PrintBook(1)"] * 4:  # The loan of patron 11 expires
+        lines += [change] + views
+
+    outputs = []
+    for cacheSize in (0, 8):
+        library = gatorLibrary.BACKENDS[backend](cacheSize)
+        clock = library.clock = gatorLibrary.CommandClock()
+        scheduler = gatorLibrary.ExpiryScheduler(library, holdExpiry=10, loanExpiry=20)
+        outputs.append(replay(library, lines, clock, scheduler))
+    assert library.renderCache.hits > 0
+    assert "Reservation made by Patron 12 for Book 3 has expired" in outputs[1]
+    assert "Book 3 Allotted to Patron 11" in outputs[1]
+    assert "Loan of Book 3 by Patron 11 has expired\n\nBook 3 Returned by Patron 11" in outputs[1]
+    assert outputs[1] == outputs[0]
+
+
+def testRangeCacheIsBoundedByBytes():
+    cache = gatorLibrary.RenderCache(100, maxRangeBytes=3 * sys.getsizeof("x" * 300))
+    cache.storeRange(0, 1000, "x" * 2000)
+    assert cache.lookupRange(0, 1000) is None
+    for bookID in range(5):
+        cache.storeRange(bookID, bookID, "x" * 300)
+    assert cache.rangeBytes <= cache.maxRangeBytes
+    assert list(cache.ranges) == [(2, 2), (3, 3), (4, 4)]
+
+
+def testInvalidateDropsOnlyTheRangesContainingTheBook():
+    cache = gatorLibrary.RenderCache(100)
+    for key in [(0, 10), (5, 5), (20, 1000), (-50, -1), (11, 19), (9, 3)]:
+        cache.storeRange(*key, "text")
+    cache.invalidate(5)
+    assert sorted(cache.ranges) == [(-50, -1), (9, 3), (11, 19), (20, 1000)]
+    cache.invalidate(1000)
+    cache.invalidate(-50)
+    assert sorted(cache.ranges) == [(9, 3), (11, 19)]
+    cache.invalidate(9)
+    cache.invalidate(19)
+    assert sorted(cache.ranges) == [(9, 3)]
+    assert cache.rangeBytes == sys.getsizeof("text")
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+@pytest.mark.parametrize("binary", [False, True])
+def testExpiryScenarioReplaysDeterministically(tmp_path, monkeypatch, backend, binary):
+    # test8.txt covers hold and loan expiry, the allotment of an expired loan to the next reservation, and the
+    # stale deadlines of fulfilled holds and returned loans. It is replayed with
+    # --hold-expiry 6 --loan-expiry 10 --clock command
+    scenario = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test8.txt")
+    with open(os.path.join(os.path.dirname(scenario), "test8_expected_output.txt")) as file:
+        expected = file.read()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    inputFile = "test8.txt"
+    shutil.copy(scenario, inputFile)
+    if binary:
+        gatorLibrary.convertToBinary(inputFile, "test8.bin")
+        inputFile = "test8.bin"
+    for _ in range(2):
+        gatorLibrary.main(inputFile, backend=backend, holdExpiry=6, loanExpiry=10, clock="command")
+        assert (tmp_path / "test8_output_file.txt").read_text() == expected
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testLookupManyKeepsTheOrderOfTheGivenIDs(backend):
+    library = gatorLibrary.BACKENDS[backend]()
+    runCommands(library, [f'InsertBook({bookID}, "Title", "Author", "Yes")' for bookID in (2, 4, 6, 8)])
+    runCommands(library, ["BorrowBook(10, 4, 1)", "BorrowBook(11, 4, 2)", "BorrowBook(12, 4, 1)"])
+    columns = library.lookupMany([8, 3, 4, 8, -1, 2, 4])
+    NO_BORROWER = gatorLibrary.Library.NO_BORROWER
+    assert columns["bookID"] == array.array("q", [8, 3, 4, 8, -1, 2, 4])
+    assert list(columns["found"]) == [1, 0, 1, 1, 0, 1, 1]
+    assert list(columns["availability"]) == [1, 0, 0, 1, 0, 1, 0]
+    assert columns["borrowedBy"] == array.array("q", [NO_BORROWER, NO_BORROWER, 10, NO_BORROWER, NO_BORROWER, NO_BORROWER, 10])
+    assert list(columns["waitlistLength"]) == [0, 0, 2, 0, 0, 0, 2]
+    assert library.availabilityMany([4, 5, 2]) == {"found": bytearray([1, 0, 1]), "availability": bytearray([0, 0, 1])}
+    assert library.lookupMany([])["bookID"] == array.array("q")
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testLookupManyFollowsTheCirculation(backend):
+    library = gatorLibrary.BACKENDS[backend]()
+    runCommands(library, ['InsertBook(1, "Title", "Author", "Yes")', 'InsertBook(2, "Title", "Author", "Yes")'])
+
+    def state():
+        columns = library.lookupMany([1, 2])
+        return list(columns["availability"]), list(columns["borrowedBy"]), list(columns["waitlistLength"])
+
+    NO_BORROWER = gatorLibrary.Library.NO_BORROWER
+    assert state() == ([1, 1], [NO_BORROWER, NO_BORROWER], [0, 0])
+    runCommands(library, ["BorrowBook(7, 1, 1)"])
+    assert state() == ([0, 1], [7, NO_BORROWER], [0, 0])
+    runCommands(library, ["BorrowBook(8, 1, 1)", "BorrowBook(9, 1, 2)"])
+    assert state() == ([0, 1], [7, NO_BORROWER], [2, 0])
+    runCommands(library, ["ReturnBook(7, 1)"])  # Allotted to patron 8, whose priority number is the lowest
+    assert state() == ([0, 1], [8, NO_BORROWER], [1, 0])
+    runCommands(library, ["ReturnBook(8, 1)", "ReturnBook(9, 1)"])
+    # Like PrintBook, availability only shows the "Yes" of an inserted book, not the flag set by ReturnBook
+    assert state() == ([0, 1], [NO_BORROWER, NO_BORROWER], [0, 0])
+    assert library.availabilityMany([1])["availability"] == bytearray([0])
+
+
+def testResolveManyAgreesAcrossBackends():
+    rng = random.Random(1)
+    bookIDs = rng.sample(range(-5000, 5000), 3000)
+    queries = [rng.randrange(-5100, 5100) for _ in range(4000)] + bookIDs[:50]
+    catalog = set(bookIDs)
+    results = {}
+    for backend, libraryClass in gatorLibrary.BACKENDS.items():
+        library = libraryClass()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for bookID in bookIDs:
+                library.insertBook(bookID, f"Title{bookID}", "Author", "Yes")
+            for bookID in bookIDs[::7]:
+                library.borrowBook(bookID % 13, bookID, 1)
+                library.borrowBook(bookID % 13 + 1, bookID, 1)
+        sortedIDs = sorted(set(queries))
+        nodes = library.resolveMany(sortedIDs)
+        assert {bookID: library.bookIDOf(node) for bookID, node in nodes.items()} == {
+            bookID: bookID for bookID in sortedIDs if bookID in catalog
+        }
+        results[backend] = library.lookupMany(queries)
+    assert len(library.blocks) > 10
+    assert results["array"] == results["rbtree"]
+    assert results["blocks"] == results["rbtree"]
+
+
+def runTestFile(tmp_path, testFile, backend):
+    """
+    Run one of the test files of the repository through main.
+
+    Params:
+    - tmp_path (pathlib.Path): directory of the output file
+    - testFile (str): name of the test file
+    - backend (str): name of the tree backend in BACKENDS
+
+    Returns:
+        list: lines of the output file
+    """
+    directory = tmp_path / backend
+    directory.mkdir()
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), testFile), directory)
+    gatorLibrary.main(str(directory / testFile), backend=backend)
+    return (directory / testFile.replace(".txt", "_output_file.txt")).read_text().splitlines()
+
+
+@pytest.mark.parametrize("backend", sorted(set(gatorLibrary.BACKENDS) - {"rbtree"}))
+@pytest.mark.parametrize("testFile", [f"test{number}.txt" for number in range(1, 8)])
+def testTestFilesGiveIdenticalOutputOnEveryBackend(tmp_path, monkeypatch, testFile, backend):
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    expected = runTestFile(tmp_path, testFile, "rbtree")
+    output = runTestFile(tmp_path, testFile, backend)
+    if backend == "blocks":
+        # The block index has no colours, its ColorFlipCount is always 0
+        assert [line for line in output if line.startswith("Colour Flip Count")] == (
+            ["Colour Flip Count: 0"] * sum(line.startswith("Colour Flip Count") for line in expected)
+        )
+        output = [line for line in output if not line.startswith("Colour Flip Count")]
+        expected = [line for line in expected if not line.startswith("Colour Flip Count")]
+    assert output == expected
+    assert len(expected) > 10
+
+
+def testArrayBackendRejectsIDsOutsideInt64():
+    library = gatorLibrary.ArrayRedBlackTree()
+    library.insertBook(library.MAX_ID, "Title", "Author", "Yes")
+    with pytest.raises(ValueError, match="Book ID"):
+        library.insertBook(10**20, "Title", "Author", "Yes")
+    with pytest.raises(ValueError, match="Patron ID"):
+        library.borrowBook(gatorLibrary.Library.NO_BORROWER, library.MAX_ID, 1)
+    output = runCommands(library, [f"BorrowBook({library.MIN_ID}, {library.MAX_ID}, 1)", f"PrintBook({library.MAX_ID})"])
+    assert f"BorrowedBy = {library.MIN_ID}\n" in output
+    assert library.lookupMany([library.MAX_ID])["borrowedBy"][0] == library.MIN_ID
+
+
+def checkLeafChain(index):
+    """
+    Check that the blocks of a SortedBlockIndex are non-empty, sorted, chained in order and indexed by their
+    first keys.
+
+    Params:
+    - index (SortedBlockIndex): the index
+
+    Returns:
+        None
+    """
+    block = index.blocks[0] if index.blocks else None
+    for i, expected in enumerate(index.blocks):
+        assert block is expected
+        assert 0 < len(block.keys) <= index.BLOCK_SIZE
+        assert block.keys == sorted(block.keys) == [node.bookID for node in block.nodes]
+        assert index.blockMins[i] == block.keys[0]
+        if i > 0:
+            assert index.blocks[i - 1].keys[-1] < block.keys[0]
+        block = block.next
+    assert block is None
+
+
+def testSortedBlockIndexMatchesRedBlackTreeAcrossBlocks():
+    rng = random.Random(2)
+    bookIDs = rng.sample(range(100000), 4000)
+    blocks, tree = gatorLibrary.SortedBlockIndex(), gatorLibrary.RedBlackTree()
+
+    def compare(lines):
+        assert runCommands(blocks, lines) == runCommands(tree, lines)
+
+    compare([f'InsertBook({bookID}, "Title{bookID}", "Author", "Yes")' for bookID in bookIDs])
+    checkLeafChain(blocks)
+    assert len(blocks.blocks) > 40
+    # Targets next to the block boundaries have their closest books in two different blocks
+    boundaries = [bookID + offset for bookID in blocks.blockMins for offset in (-1, 0, 1)]
+    compare([f"FindClosestBook({bookID})" for bookID in boundaries] + ["PrintBooks(0, 100000)"])
+
+    splitCount = len(blocks.blocks)
+    rng.shuffle(bookIDs)
+    for start in range(0, 3900, 300):
+        compare([f"DeleteBook({bookID})" for bookID in bookIDs[start:start + 300]])
+        checkLeafChain(blocks)
+        targets = [rng.randrange(-10, 100010) for _ in range(30)] + blocks.blockMins
+        compare([f"FindClosestBook({bookID})" for bookID in targets] + ["PrintBooks(0, 100000)"])
+    assert len(blocks.blocks) < splitCount // 4
+
+    compare([f"DeleteBook({bookID})" for bookID in bookIDs[3900:]] + ["FindClosestBook(5)", "PrintBooks(0, 100000)"])
+    assert blocks.blocks == [] and blocks.blockMins == []
+    compare(['InsertBook(7, "Title", "Author", "Yes")', "FindClosestBook(5)", "PrintBooks(0, 10)"])
+
+
+def buildExportLibrary(backend, metadataBudget=None):
+    """
+    Create a library with books covering every exported field: commas, quotes and non-ASCII characters in the
+    titles, a borrowed book with a waitlist in priority order, and a returned book.
+
+    Params:
+    - backend (str): name of the tree backend in BACKENDS
+    - metadataBudget (int): memory budget of a MetadataStore holding the titles and authors, None for no store
+
+    Returns:
+        The library
+    """
+    library = gatorLibrary.BACKENDS[backend]()
+    if metadataBudget is not None:
+        gatorLibrary.MetadataStore(library, metadataBudget)
+    runCommands(library, [
+        'InsertBook(1, "Plain", "Author", "Yes")',
+        'InsertBook(2, "Commas, and more", "Author", "Yes")',
+        'InsertBook(3, "Título «ñ»", "Åuthor", "Yes")',
+        'InsertBook(5, "Returned", "Author", "Yes")',
+        "BorrowBook(10, 2, 1)",
+        "BorrowBook(11, 2, 3)",
+        "BorrowBook(12, 2, 1)",
+        "BorrowBook(13, 5, 1)",
+        "ReturnBook(13, 5)",
+    ])
+    library.insertBook(4, 'Say "hi"', "Author", "No")
+    return library
+
+
+EXPORTED_RECORDS = [
+    (1, "Plain", "Author", "Yes", None, []),
+    (2, "Commas, and more", "Author", "No", 10, [12, 11]),
+    (3, "Título «ñ»", "Åuthor", "Yes", None, []),
+    (4, 'Say "hi"', "Author", "No", None, []),
+    (5, "Returned", "Author", "No", None, []),
+]
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+@pytest.mark.parametrize("metadataBudget", [None, 0])
+def testIterRecordsMatchesBookRecord(backend, metadataBudget):
+    library = buildExportLibrary(backend, metadataBudget)
+    assert list(library.iterRecords(0, 10)) == EXPORTED_RECORDS
+    assert list(library.iterRecords(2, 4)) == [library.bookRecord(node) for node in library.iterBooks(2, 4)]
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testExportJsonl(backend):
+    output = io.StringIO()
+    assert gatorLibrary.exportBooks(buildExportLibrary(backend), output, "jsonl", 0, 10, chunkSize=2) == 5
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert records == [dict(zip(gatorLibrary.EXPORT_FIELDS, record)) for record in EXPORTED_RECORDS]
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testExportCsv(backend):
+    output = io.StringIO()
+    gatorLibrary.exportBooks(buildExportLibrary(backend), output, "csv", 2, 4)
+    rows = list(csv.reader(io.StringIO(output.getvalue())))
+    assert rows == [
+        list(gatorLibrary.EXPORT_FIELDS),
+        ["2", "Commas, and more", "Author", "No", "10", "12 11"],
+        ["3", "Título «ñ»", "Åuthor", "Yes", "", ""],
+        ["4", 'Say "hi"', "Author", "No", "", ""],
+    ]
+
+
+def testExportColumnsInChunks():
+    output = io.StringIO()
+    assert gatorLibrary.exportBooks(buildExportLibrary("rbtree"), output, "columns", 0, 10, chunkSize=2) == 5
+    chunks = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [chunk["bookID"] for chunk in chunks] == [[1, 2], [3, 4], [5]]
+    assert chunks[0]["reservations"] == [[], [12, 11]]
+    assert chunks[0]["borrowedBy"] == [None, 10]
+    assert list(chunks[1]) == list(gatorLibrary.EXPORT_FIELDS)
+
+
+@pytest.mark.parametrize("bookID1, bookID2", [(6, 100), (4, 3)])
+def testExportOfAnEmptyRange(bookID1, bookID2):
+    library = buildExportLibrary("rbtree")
+    for exportFormat, expected in [("jsonl", ""), ("columns", ""), ("csv", ",".join(gatorLibrary.EXPORT_FIELDS) + "\n")]:
+        output = io.StringIO()
+        assert gatorLibrary.exportBooks(library, output, exportFormat, bookID1, bookID2) == 0
+        assert output.getvalue() == expected
+
+
+def testExportOfAnUnknownFormat():
+    library = buildExportLibrary("rbtree")
+    with pytest.raises(ValueError, match="Unknown export format"):
+        gatorLibrary.exportBooks(library, io.StringIO(), "xml", 0, 10)
+    assert runCommands(library, ["Export(xml, 0, 10)"]) == "Unknown export format xml\n\n"
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def testExportCommandThroughMain(tmp_path, monkeypatch, binary):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    lines = [
+        'InsertBook(1, "Title, with a comma", "Author", "Yes")',
+        'InsertBook(2, "Título", "Author", "Yes")',
+        "BorrowBook(10, 2, 1)",
+        "BorrowBook(11, 2, 1)",
+        "Export(jsonl, 1, 2)",
+        "Export(csv, 2, 2)",
+        "Quit()",
+    ]
+    (tmp_path / "input.txt").write_text("\n".join(lines) + "\n")
+    inputFile = "input.txt"
+    if binary:
+        gatorLibrary.convertToBinary(inputFile, "input.bin")
+        inputFile = "input.bin"
+    gatorLibrary.main(inputFile)
+    output = (tmp_path / "input_output_file.txt").read_text().split("\n")
+    assert output[:4] == ["Book 2 Borrowed by Patron 10", "", "Book 2 Reserved by Patron 11", ""]
+    assert json.loads(output[4])["title"] == "Title, with a comma"
+    assert json.loads(output[5]) == {
+        "bookID": 2, "title": "Título", "author": "Author", "availability": "No", "borrowedBy": 10,
+        "reservations": [11],
+    }
+    assert list(csv.reader(output[6:8])) == [list(gatorLibrary.EXPORT_FIELDS), ["2", "Título", "Author", "No", "10", "11"]]
+    assert output[8:] == ["Program Terminated!!", ""]
+
+
+def testMetadataStoreRefusesAnExistingFile(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE metadata (key INTEGER PRIMARY KEY, title TEXT, author TEXT)")
+    connection.execute("INSERT INTO metadata VALUES (1, 'Kept', 'Kept')")
+    connection.commit()
+    connection.close()
+    with pytest.raises(ValueError, match="already exists"):
+        gatorLibrary.MetadataStore(gatorLibrary.RedBlackTree(), 100, path)
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT * FROM metadata").fetchall() == [(1, "Kept", "Kept")]
+    connection.close()
+    with pytest.raises(SystemExit):
+        gatorLibrary.parseArguments(["input.txt", "--metadata-budget", "100", "--metadata-file", path])
+
+
+def testMetadataFileIsDeletedSoTheNextRunCanReuseIt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    (tmp_path / "input.txt").write_text('InsertBook(1, "Title", "Author", "Yes")\nPrintBook(1)\nQuit()\n')
+    for _ in range(2):
+        arguments = gatorLibrary.parseArguments(["input.txt", "--metadata-budget", "0", "--metadata-file", "meta.db"])
+        gatorLibrary.main(arguments.inputFileName, metadataBudget=arguments.metadata_budget,
+                          metadataFile=arguments.metadata_file)
+        assert not (tmp_path / "meta.db").exists()
+        assert '"Title"' in (tmp_path / "input_output_file.txt").read_text()
+
+
+@pytest.mark.parametrize("backend", sorted(gatorLibrary.BACKENDS))
+def testMetadataBudgetBoundsTheResidentSet(backend):
+    lines = [f'InsertBook({bookID}, "Title of book {bookID}", "Author {bookID % 7}", "Yes")' for bookID in range(500)]
+    lines += ["BorrowBook(1, 10, 1)", "BorrowBook(2, 10, 1)", "DeleteBook(20)", "PrintBook(10)"]
+    expected = runCommands(gatorLibrary.BACKENDS[backend](), lines + ["PrintBooks(0, 499)"])
+
+    library = gatorLibrary.BACKENDS[backend]()
+    store = gatorLibrary.MetadataStore(library, 2000)
+    output = runCommands(library, lines)
+    assert store.residentBytes <= store.memoryBudget
+    faults = store.faults
+    output += runCommands(library, ["PrintBooks(0, 499)"])
+    store.close()
+    assert store.residentBytes <= store.memoryBudget
+    assert store.faults > faults + 400
+    assert output == expected
+
+
+def testMetadataBudgetRejectsTheRenderCache():
+    with pytest.raises(ValueError, match="render cache"):
+        gatorLibrary.MetadataStore(gatorLibrary.RedBlackTree(cacheSize=10), 100)
+    with pytest.raises(SystemExit):
+        gatorLibrary.parseArguments(["input.txt", "--metadata-budget", "100", "--cache-size", "10"])
+
+
+def runWithTimeout(function, timeout=5):
+    """
+    Run a function in a daemon thread and fail if it does not return in time.
+
+    Params:
+    - function (callable): function to run
+    - timeout (float): seconds to wait
+
+    Returns:
+        None
+    """
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "did not return"
+
+
+def testAsyncSubscriberReceivesEventsPublishedFromAnotherThread():
+    library = gatorLibrary.RedBlackTree()
+    subscription = gatorLibrary.ChangeFeed(library).subscribe(maxSize=2)
+    received = []
+
+    async def consume():
+        async for event in subscription:
+            received.append(event)
+
+    def publish():
+        for bookID in range(1, 6):
+            library.insertBook(bookID, f"Title{bookID}", "Author", "Yes")
+        library.borrowBook(10, 3, 1)
+        subscription.close()
+
+    async def run():
+        consumer = asyncio.create_task(consume())
+        await asyncio.to_thread(publish)
+        await consumer
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        runWithTimeout(lambda: asyncio.run(run()))
+    assert [event.sequence for event in received] == list(range(6))
+    assert received[-1] == gatorLibrary.ChangeEvent(5, "Borrowed", 3, (10,))
+
+
+def testCancelledAsyncSubscriberLeavesNothingWaiting():
+    library = gatorLibrary.RedBlackTree()
+    subscription = gatorLibrary.ChangeFeed(library).subscribe()
+    received = []
+
+    async def consume():
+        async for event in subscription:
+            received.append(event)
+
+    async def run():
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        library.insertBook(1, "Title", "Author", "Yes")
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+
+    threadCount = threading.active_count()
+    runWithTimeout(lambda: asyncio.run(run()))
+    assert [event.kind for event in received] == ["Inserted"]
+    assert subscription.waiters == []
+    assert threading.active_count() == threadCount
+    # The subscription still works after the consumer went away
+    library.insertBook(2, "Title", "Author", "Yes")
+    assert subscription.get(timeout=1).bookID == 2
+
+
+def testDropOldestKeepsTheNewestEvents():
+    library = gatorLibrary.RedBlackTree()
+    subscription = gatorLibrary.ChangeFeed(library).subscribe(maxSize=3, overflow=gatorLibrary.Subscription.DROP_OLDEST)
+    for bookID in range(1, 6):
+        library.insertBook(bookID, f"Title{bookID}", "Author", "Yes")
+    subscription.close()
+    assert [event.sequence for event in subscription] == [2, 3, 4]
+    assert subscription.dropped == 2
+
+
+def testBlockedPublisherWaitsForTheConsumer():
+    library = gatorLibrary.RedBlackTree()
+    subscription = gatorLibrary.ChangeFeed(library).subscribe(maxSize=1)
+    publisher = threading.Thread(
+        target=lambda: [library.insertBook(bookID, "Title", "Author", "Yes") for bookID in range(1, 4)], daemon=True
+    )
+    publisher.start()
+    publisher.join(0.1)
+    # The second event waits for room in the queue
+    assert publisher.is_alive()
+    assert [subscription.get(timeout=5).bookID for _ in range(3)] == [1, 2, 3]
+    publisher.join(5)
+    assert not publisher.is_alive()